@@ -0,0 +1,50 @@
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+# Each scenario runs in a fresh interpreter and prints the seconds it took
+SCENARIOS = [
+    ("import label_reader", "import label_reader", {}),
+    ("food_service (pickle)", "import food_service", {"MODEL_FORMAT": "pickle"}),
+    ("food_service (native)", "import food_service", {"MODEL_FORMAT": "native"}),
+    ("Flask API (pickle)", "import food_scanner_api", {"MODEL_FORMAT": "pickle"}),
+    ("Flask API (native)", "import food_scanner_api", {"MODEL_FORMAT": "native"}),
+    ("Flask API (compiled)", "import food_scanner_api", {"INFERENCE_BACKEND": "compiled"}),
+    ("FoodScanner() (pickle)", "import food_scanner; food_scanner.FoodScanner()", {"MODEL_FORMAT": "pickle"}),
+    ("FoodScanner() (native)", "import food_scanner; food_scanner.FoodScanner()", {"MODEL_FORMAT": "native"}),
+]
+
+TEMPLATE = """
+import time, sys, io
+start = time.perf_counter()
+sys.stdout = io.StringIO()
+{code}
+sys.stdout = sys.__stdout__
+print(time.perf_counter() - start)
+"""
+
+def time_scenario(code, env, repeat):
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", TEMPLATE.format(code=code)],
+            env={**os.environ, **env}, capture_output=True, text=True, check=True
+        ).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for the backend entry points")
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="Fresh interpreters per scenario")
+    args = parser.parse_args()
+
+    print(f"⏱️  Cold start, {args.repeat} fresh interpreters per scenario")
+    print(f"{'scenario':<26} {'median':>9} {'min':>9}")
+    for label, code, env in SCENARIOS:
+        timings = time_scenario(code, env, args.repeat)
+        print(f"{label:<26} {statistics.median(timings) * 1000:7.0f}ms {min(timings) * 1000:7.0f}ms")
+
+if __name__ == "__main__":
+    main()
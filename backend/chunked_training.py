@@ -0,0 +1,257 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from feature_encoding import FeatureEncoder
+from model_store import LabelDecoder, save_native
+from train_model import BASE_PARAMS, booster_params, clear_training_state
+
+try:
+    import resource
+except ImportError:
+    # POSIX only; the peak memory report is skipped elsewhere
+    resource = None
+
+# CSV, target column, columns that are not features, native model base path
+DATASETS = {
+    "food": ("data/food_database_fixed.csv", "Disease_Risk", ["Food_Name"], "models/food_analysis_model"),
+    "user": ("data/custom_nutrition_dataset.csv", "Disease", [], "models/xgboost_model"),
+}
+# A parsed chunk is held as a DataFrame, its float32 copy and XGBoost's copy while
+# a page is sketched and written, so each row costs a few times its in-memory size
+CHUNK_OVERHEAD = 4
+
+def peak_mb():
+    """Peak resident memory in MB, NaN where it cannot be measured"""
+    if resource is None:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+def booster_state_mb(train_rows, valid_rows, num_class):
+    """XGBoost's per-row training state (gradients, prediction caches), which stays in RAM"""
+    return (train_rows * (num_class * 12 + 4) + valid_rows * num_class * 4) / (1024 * 1024)
+
+def bytes_per_row(csv_path, sample_rows=1000):
+    """Average in-memory size of one parsed row, from a sample at the top of the file"""
+    sample = pd.read_csv(csv_path, nrows=sample_rows)
+    return max(1, int(sample.memory_usage(deep=True).sum() / max(len(sample), 1)))
+
+def chunk_rows_for_budget(csv_path, memory_budget_mb):
+    """Rows per chunk that keep one chunk's working set within the memory budget"""
+    return max(1000, int(memory_budget_mb * 1024 * 1024 / (bytes_per_row(csv_path) * CHUNK_OVERHEAD)))
+
+def read_chunks(csv_path, columns, chunk_rows, text_columns=(), nrows=None):
+    """Chunked reader; text_columns are read as str so no chunk parses them as numbers"""
+    dtype = {col: str for col in text_columns}
+    return pd.read_csv(csv_path, usecols=columns, dtype=dtype, chunksize=chunk_rows, nrows=nrows)
+
+def is_text(values):
+    """True when a column read as str holds a value that does not parse as a number"""
+    return bool((pd.to_numeric(values, errors="coerce").isna() & values.notna()).any())
+
+def fit_encoders(csv_path, feature_cols, target_col, chunk_rows):
+    """One pass over the file collecting categories, so codes match LabelEncoder on the full data.
+
+    Every column is read as str, so a categorical column keeps its raw text in
+    chunks where it happens to look numeric. A column whose first non-numeric
+    value turns up late has the rows before it re-read for their categories.
+    Returns (FeatureEncoder, {column: sorted categories}, sorted target classes, row count).
+    """
+    columns = feature_cols + [target_col]
+    categories = {}
+    first_seen = {}
+    classes = set()
+    rows = 0
+    for chunk in read_chunks(csv_path, columns, chunk_rows, text_columns=columns):
+        classes.update(chunk[target_col].dropna().unique())
+        for col in feature_cols:
+            if col not in categories and is_text(chunk[col]):
+                categories[col] = set()
+                first_seen[col] = rows
+            if col in categories:
+                categories[col].update(chunk[col].astype(str).unique())
+        rows += len(chunk)
+    late = [col for col, start in first_seen.items() if start > 0]
+    if late:
+        for chunk in read_chunks(csv_path, late, chunk_rows, text_columns=late, nrows=max(first_seen[c] for c in late)):
+            for col in late:
+                # Only rows before this column's first text value were missed
+                missed = chunk[col][chunk.index < first_seen[col]]
+                categories[col].update(missed.astype(str).unique())
+    feature_classes = {col: sorted(values) for col, values in categories.items()}
+    return FeatureEncoder.from_classes(feature_classes), feature_classes, sorted(classes), rows
+
+def encode_chunk(chunk, feature_cols, target_col, encoder, class_codes):
+    """(X float32, y codes) for one chunk; rows with an unknown target are dropped"""
+    y = chunk[target_col].astype(str).map(class_codes)
+    keep = y.notna().to_numpy()
+    X = np.empty((int(keep.sum()), len(feature_cols)), dtype=np.float32)
+    for j, col in enumerate(feature_cols):
+        values = chunk[col].to_numpy()[keep]
+        if col in encoder:
+            X[:, j] = encoder.encode_column(col, values.tolist())
+        else:
+            X[:, j] = pd.to_numeric(values, errors="coerce")
+    return X, y.to_numpy()[keep].astype(np.int32)
+
+def split_mask(rows, chunk_index, split, test_size, valid_size, seed):
+    """Deterministic rows of one split ("train", "valid" or "test") for a chunk, identical on every pass.
+
+    Test rows are only ever scored, valid rows only drive early stopping.
+    """
+    draw = np.random.default_rng([seed, chunk_index]).random(rows)
+    if split == "test":
+        return draw < test_size
+    if split == "valid":
+        return (draw >= test_size) & (draw < test_size + valid_size)
+    return draw >= test_size + valid_size
+
+def text_columns(encoder, target_col):
+    return list(encoder.mappings) + [target_col]
+
+class ChunkIter(xgb.DataIter):
+    """Feeds one split of the CSV to XGBoost chunk by chunk; pages are cached on disk"""
+
+    def __init__(self, csv_path, feature_cols, target_col, encoder, class_codes, chunk_rows,
+                 split, test_size, valid_size, seed, cache_prefix):
+        self.csv_path = csv_path
+        self.feature_cols = feature_cols
+        self.target_col = target_col
+        self.encoder = encoder
+        self.class_codes = class_codes
+        self.chunk_rows = chunk_rows
+        self.split = split
+        self.test_size = test_size
+        self.valid_size = valid_size
+        self.seed = seed
+        self.rows = 0
+        self._chunks = None
+        self._index = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._chunks is None:
+            self._chunks = read_chunks(self.csv_path, self.feature_cols + [self.target_col], self.chunk_rows,
+                                       text_columns=text_columns(self.encoder, self.target_col))
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            return False
+        X, y = encode_chunk(chunk, self.feature_cols, self.target_col, self.encoder, self.class_codes)
+        rows = split_mask(len(X), self._index, self.split, self.test_size, self.valid_size, self.seed)
+        self._index += 1
+        self.rows += int(rows.sum())
+        input_data(data=X[rows], label=y[rows], feature_names=self.feature_cols)
+        return True
+
+    def reset(self):
+        self._chunks = None
+        self._index = 0
+        self.rows = 0
+
+def streaming_accuracy(booster, csv_path, feature_cols, target_col, encoder, class_codes, chunk_rows,
+                       test_size, valid_size, seed):
+    """Accuracy on the test rows (never trained on nor used for early stopping), predicted chunk by chunk"""
+    correct = total = 0
+    chunks = read_chunks(csv_path, feature_cols + [target_col], chunk_rows,
+                         text_columns=text_columns(encoder, target_col))
+    for index, chunk in enumerate(chunks):
+        X, y = encode_chunk(chunk, feature_cols, target_col, encoder, class_codes)
+        held_out = split_mask(len(X), index, "test", test_size, valid_size, seed)
+        if not held_out.any():
+            continue
+        probabilities = booster.inplace_predict(X[held_out], iteration_range=(0, booster.best_iteration + 1))
+        predicted = probabilities.argmax(axis=1) if probabilities.ndim == 2 else (probabilities > 0.5).astype(int)
+        correct += int((predicted == y[held_out]).sum())
+        total += int(held_out.sum())
+    return correct / total if total else float("nan")
+
+def train_chunked(name, csv_path=None, memory_budget_mb=512, chunk_rows=None, params=None,
+                  num_boost_round=None, early_stopping_rounds=30, test_size=0.2, valid_size=0.1, seed=42,
+                  cache_dir="cache/xgb_external", max_bin=256, output_base=None):
+    """Train a model from a CSV without ever holding the whole file in memory.
+
+    Pass 1 fits the category encoders and target classes chunk by chunk.
+    Pass 2 streams encoded chunks through a DataIter into external-memory
+    quantile pages under cache_dir, then boosts with the hist method,
+    early-stopping on the validation rows. Accuracy is reported on the test
+    rows, which neither training nor early stopping has seen. The model is
+    saved in the native format (booster + JSON sidecar with the encoders).
+    """
+    default_csv, target_col, exclude, base = DATASETS[name]
+    csv_path = csv_path or default_csv
+    output_base = output_base or base
+    header = pd.read_csv(csv_path, nrows=0).columns
+    feature_cols = [col for col in header if col != target_col and col not in exclude]
+    chunk_rows = chunk_rows or chunk_rows_for_budget(csv_path, memory_budget_mb)
+    print(f"📦 Streaming {csv_path} in chunks of {chunk_rows:,} rows (budget {memory_budget_mb} MB)")
+
+    started = time.perf_counter()
+    encoder, feature_classes, classes, rows = fit_encoders(csv_path, feature_cols, target_col, chunk_rows)
+    class_codes = {c: code for code, c in enumerate(classes)}
+    print(f"🔤 Encoders fitted over {rows:,} rows: {len(classes)} classes, "
+          f"{len(feature_classes)} categorical features ({time.perf_counter() - started:.1f}s)")
+
+    # Pages go to a private directory inside cache_dir, the only thing removed afterwards
+    os.makedirs(cache_dir, exist_ok=True)
+    pages_dir = tempfile.mkdtemp(prefix=f"{name}-", dir=cache_dir)
+    iter_args = (csv_path, feature_cols, target_col, encoder, class_codes, chunk_rows)
+    split_args = (test_size, valid_size, seed)
+    train_iter = ChunkIter(*iter_args, "train", *split_args, os.path.join(pages_dir, "train"))
+    valid_iter = ChunkIter(*iter_args, "valid", *split_args, os.path.join(pages_dir, "valid"))
+    try:
+        dtrain = xgb.ExtMemQuantileDMatrix(train_iter, max_bin=max_bin)
+        dvalid = xgb.ExtMemQuantileDMatrix(valid_iter, max_bin=max_bin, ref=dtrain)
+        print(f"💽 External-memory pages built for {dtrain.num_row():,} train / {dvalid.num_row():,} validation rows "
+              f"({time.perf_counter() - started:.1f}s)")
+        print(f"🧠 About {booster_state_mb(dtrain.num_row(), dvalid.num_row(), max(len(classes), 1)):.0f} MB of "
+              f"per-row booster state is held in RAM on top of the chunk budget")
+
+        booster = xgb.train(
+            booster_params(params, len(classes)), dtrain,
+            num_boost_round=num_boost_round or {**BASE_PARAMS, **(params or {})}["n_estimators"],
+            evals=[(dvalid, "valid")],
+            early_stopping_rounds=early_stopping_rounds,
+            verbose_eval=False
+        )
+    finally:
+        shutil.rmtree(pages_dir, ignore_errors=True)
+
+    accuracy = streaming_accuracy(booster, *iter_args, *split_args)
+    print(f"\n✅ Held-out test accuracy: {accuracy:.3f} ({booster.best_iteration + 1} rounds)")
+    print(f"⏱️  {time.perf_counter() - started:.1f}s, peak RSS {peak_mb():.0f} MB")
+
+    booster.feature_names = feature_cols
+    feature_encoders = {col: LabelDecoder(values) for col, values in feature_classes.items()}
+    model_path, meta_path = save_native(booster, LabelDecoder(classes), output_base, feature_cols, feature_encoders)
+    print(f"💾 Model saved to {model_path} and {meta_path}")
+    if name == "food" and output_base == base:
+        # The pickled model the incremental trainer continues from is now stale
+        clear_training_state()
+    return booster
+
+def main():
+    parser = argparse.ArgumentParser(description="Out-of-core XGBoost training from chunked CSV reads")
+    parser.add_argument("model", choices=list(DATASETS))
+    parser.add_argument("--csv", default=None, help="Training CSV (default: the model's usual dataset)")
+    parser.add_argument("--memory-budget", type=float, default=float(os.environ.get("TRAIN_MEMORY_BUDGET_MB", 512)),
+                        help="MB one chunk's working set may use; sets the chunk size")
+    parser.add_argument("--chunk-rows", type=int, default=None, help="Override the chunk size directly")
+    parser.add_argument("--rounds", type=int, default=None, help="Boosting rounds (default: BASE_PARAMS n_estimators)")
+    parser.add_argument("--early-stopping", type=int, default=30)
+    parser.add_argument("--cache-dir", default="cache/xgb_external", help="Where XGBoost writes its pages")
+    parser.add_argument("--output", default=None, help="Native model base path (default: the served model)")
+    args = parser.parse_args()
+    train_chunked(
+        args.model, csv_path=args.csv, memory_budget_mb=args.memory_budget, chunk_rows=args.chunk_rows,
+        num_boost_round=args.rounds, early_stopping_rounds=args.early_stopping, cache_dir=args.cache_dir,
+        output_base=args.output
+    )
+
+if __name__ == "__main__":
+    main()
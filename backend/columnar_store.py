@@ -0,0 +1,153 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+SUFFIX = ".columnar"
+MANIFEST = "manifest.json"
+DEFAULT_SOURCES = [
+    "data/food_database.csv",
+    "data/food_database_fixed.csv",
+    "data/custom_nutrition_dataset.csv",
+]
+
+class DictionaryColumn:
+    """Dictionary-encoded strings: int32 codes into a fixed-width string array.
+
+    Indexing decodes only the requested rows; code -1 marks a missing value.
+    """
+
+    def __init__(self, codes, dictionary):
+        self.codes = codes
+        self.dictionary = dictionary
+        self.has_missing = bool(len(codes)) and bool((codes < 0).any())
+
+    @property
+    def dtype(self):
+        return np.dtype(object) if self.has_missing else self.dictionary.dtype
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        codes = self.codes[index]
+        if np.ndim(codes) == 0:
+            return self.dictionary[codes] if codes >= 0 else np.nan
+        if not self.has_missing:
+            return self.dictionary[codes]
+        values = self.dictionary.astype(object)[codes]
+        values[codes < 0] = np.nan
+        return values
+
+    def __array__(self, dtype=None, copy=None):
+        values = self[:]
+        return values.astype(dtype) if dtype is not None else values
+
+    def item(self, pos):
+        value = self[pos]
+        return str(value) if isinstance(value, str) else value
+
+    def tolist(self):
+        return [self.item(pos) for pos in range(len(self))]
+
+def columnar_path(csv_path):
+    """Directory the columnar build of csv_path lives in"""
+    return f"{csv_path}{SUFFIX}"
+
+def source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def build_columnar(csv_path, out_path=None, **read_csv_kwargs):
+    """Convert a CSV into one .npy file per column plus a JSON manifest.
+
+    Numeric columns keep their pandas dtype; every other column is stored as
+    int32 codes plus a dictionary of distinct strings.
+    """
+    out_path = out_path or columnar_path(csv_path)
+    signature = source_signature(csv_path)
+    df = pd.read_csv(csv_path, **read_csv_kwargs)
+    return write_columnar(df, out_path, os.path.basename(csv_path), signature)
+
+def write_columnar(df, out_path, source=None, signature=None):
+    """Write a DataFrame in the columnar layout; without a source signature it is never considered stale"""
+    tmp_path = f"{out_path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    columns = []
+    for i, col in enumerate(df.columns):
+        values = df[col]
+        entry = {"name": col, "file": f"{i}.npy"}
+        if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+            entry["kind"] = "numeric"
+            np.save(os.path.join(tmp_path, entry["file"]), values.to_numpy())
+        else:
+            codes, uniques = pd.factorize(values)
+            entry["kind"] = "dictionary"
+            entry["dictionary"] = f"{i}.dict.npy"
+            np.save(os.path.join(tmp_path, entry["file"]), codes.astype(np.int32))
+            np.save(os.path.join(tmp_path, entry["dictionary"]), np.array([str(u) for u in uniques], dtype=str))
+        columns.append(entry)
+
+    with open(os.path.join(tmp_path, MANIFEST), "w") as f:
+        json.dump({
+            "version": FORMAT_VERSION,
+            "source": source,
+            "source_signature": signature,
+            "rows": len(df),
+            "columns": columns
+        }, f, indent=2)
+    shutil.rmtree(out_path, ignore_errors=True)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+def open_columnar(csv_path, path=None, check_source=True):
+    """Memory-map a columnar build as {column: array}, or None if missing or stale.
+
+    The arrays are read-only np.memmap views, so every process that opens the
+    same build shares its pages through the OS page cache.
+    """
+    path = path or columnar_path(csv_path)
+    manifest_path = os.path.join(path, MANIFEST)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != FORMAT_VERSION:
+        return None
+    signature = manifest.get("source_signature")
+    if check_source and signature is not None and os.path.exists(csv_path) and signature != source_signature(csv_path):
+        print(f"⚠️  {path} is older than {csv_path}; rebuild it with columnar_store.py", file=sys.stderr)
+        return None
+
+    columns = {}
+    for entry in manifest["columns"]:
+        values = np.load(os.path.join(path, entry["file"]), mmap_mode="r")
+        if entry["kind"] == "dictionary":
+            dictionary = np.load(os.path.join(path, entry["dictionary"]), mmap_mode="r")
+            values = DictionaryColumn(values, dictionary)
+        columns[entry["name"]] = values
+    return columns
+
+def read_table(csv_path, **read_csv_kwargs):
+    """DataFrame for csv_path, from its columnar build when one is up to date"""
+    columns = open_columnar(csv_path)
+    if columns is None:
+        return pd.read_csv(csv_path, **read_csv_kwargs)
+    return pd.DataFrame({col: np.asarray(values) for col, values in columns.items()})
+
+def main():
+    parser = argparse.ArgumentParser(description="Build memory-mappable columnar copies of the data CSVs")
+    parser.add_argument("csv", nargs="*", default=DEFAULT_SOURCES, help="CSV files to convert")
+    args = parser.parse_args()
+    for csv_path in args.csv:
+        out_path = build_columnar(csv_path)
+        print(f"💾 {csv_path} -> {out_path}")
+
+if __name__ == "__main__":
+    main()
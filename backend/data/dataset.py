@@ -1,31 +1,224 @@
+import os
+import sys
+import time
+import argparse
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
 
-# === Load your datasets ===
-demographic = pd.read_csv("demographic.csv")
-diet = pd.read_csv("diet.csv")
-examination = pd.read_csv("examination.csv")
-labs = pd.read_csv("labs.csv")
-medications = pd.read_csv("medications.csv", encoding="latin1")
-
-# Optional / reference datasets (can enrich later if needed)
-food_macros = pd.read_csv("detailed_meals_macros_CLEANED.csv")
-food_nutrition = pd.read_csv("Food_and_Nutrition__.csv")
-
-# === 1. NHANES-style Master Dataset (union/merged) ===
-# Common key is usually "SEQN" (participant ID). Adjust if different.
-nhanes_master = demographic.merge(diet, on="SEQN", how="inner") \
-                           .merge(examination, on="SEQN", how="inner") \
-                           .merge(labs, on="SEQN", how="inner") \
-                           .merge(medications, on="SEQN", how="left")
-
-# Save NHANES-style dataset
-nhanes_master.to_csv("nhanes_master_dataset.csv", index=False)
-print("✅ NHANES-style master dataset saved as nhanes_master_dataset.csv")
-
-# === 2. Custom Nutrition Dataset ===
-# Combine cleaned macros + nutrition info
-custom_nutrition = pd.concat([food_macros, food_nutrition], ignore_index=True)
-
-# Save Custom Nutrition dataset
-custom_nutrition.to_csv("custom_nutrition_dataset.csv", index=False)
-print("✅ Custom nutrition dataset saved as custom_nutrition_dataset.csv")
+# Memory reporting is best-effort: psutil where installed, else the POSIX-only resource module
+try:
+    import psutil
+except ImportError:
+    psutil = None
+try:
+    import resource
+except ImportError:
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from columnar_store import columnar_path, source_signature, write_columnar
+
+# === NHANES sources: only the columns the master dataset needs ===
+# Everything but SEQN is read as float32 (NHANES codes missing answers as blanks)
+SOURCES = {
+    "demographic": ("demographic.csv", [
+        "RIAGENDR", "RIDAGEYR", "RIDRETH3", "DMDEDUC2", "DMDMARTL", "DMDHHSIZ", "INDFMPIR",
+    ]),
+    "diet": ("diet.csv", [
+        "DR1TKCAL", "DR1TPROT", "DR1TCARB", "DR1TSUGR", "DR1TFIBE", "DR1TTFAT", "DR1TSFAT",
+        "DR1TCHOL", "DR1TSODI", "DR1TPOTA", "DR1TCALC", "DR1TALCO",
+    ]),
+    "examination": ("examination.csv", [
+        "BMXWT", "BMXHT", "BMXBMI", "BMXWAIST", "BPXSY1", "BPXDI1", "BPXPLS",
+    ]),
+    "labs": ("labs.csv", [
+        "LBXGLU", "LBXGH", "LBXTC", "LBDHDD", "LBXTR", "LBDLDL", "LBXSCR", "LBXSUA", "URXUMA",
+    ]),
+}
+MEDICATIONS = "medications.csv"
+MEDICATION_DTYPES = {
+    "SEQN": np.int32, "RXDUSE": np.float32, "RXDDRUG": str, "RXDDAYS": np.float32,
+    "RXDRSC1": str, "RXDRSC2": str, "RXDRSC3": str,
+}
+# RXDDRUG placeholders for refused / don't know / no medication
+NO_DRUG = ["55555", "77777", "99999"]
+# ICD-10 prefixes of the reasons for use, one 0/1 column per group
+RX_CONDITIONS = {
+    "rx_diabetes": ("E10", "E11", "E13"),
+    "rx_hypertension": ("I10", "I11", "I12", "I13", "I15"),
+    "rx_lipids": ("E78",),
+    "rx_kidney": ("N18", "N19"),
+    "rx_obesity": ("E66",),
+}
+OUTPUT = "nhanes_master_dataset.csv"
+
+def rss_mb():
+    """Current resident memory in MB, NaN where it cannot be measured"""
+    try:
+        if psutil is not None:
+            return psutil.Process().memory_info().rss / 1024 / 1024
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except Exception:
+        pass
+    return float("nan")
+
+def peak_mb():
+    """Peak resident memory in MB, NaN where it cannot be measured"""
+    try:
+        if psutil is not None:
+            # Windows reports the peak working set; elsewhere fall through to resource
+            peak = getattr(psutil.Process().memory_info(), "peak_wset", None)
+            if peak is not None:
+                return peak / 1024 / 1024
+        if resource is not None:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # ru_maxrss is bytes on macOS, KB on Linux
+            return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    except Exception:
+        pass
+    return float("nan")
+
+@contextmanager
+def step(name):
+    """Log the wall time, current RSS and peak RSS of one pipeline step"""
+    started = time.perf_counter()
+    yield
+    try:
+        print(f"⏱️  {name:<30} {time.perf_counter() - started:7.2f}s   rss {rss_mb():7.1f} MB   peak {peak_mb():7.1f} MB")
+    except Exception:
+        # Logging must never stop the pipeline
+        pass
+
+def read_source(path, columns, chunk_rows, keys=None, encoding=None):
+    """SEQN-indexed, SEQN-sorted frame of the wanted columns, read in chunks.
+
+    Columns missing from the file are reported and skipped. With keys, rows
+    for participants outside that sorted SEQN array are dropped chunk by chunk.
+    """
+    header = pd.read_csv(path, nrows=0, encoding=encoding).columns
+    missing = [col for col in columns if col not in header]
+    if missing:
+        print(f"⚠️  {path} has no {', '.join(missing)}")
+    columns = [col for col in columns if col in header]
+    dtypes = {"SEQN": np.int32, **{col: np.float32 for col in columns}}
+    parts = []
+    for chunk in pd.read_csv(path, usecols=["SEQN"] + columns, dtype=dtypes, chunksize=chunk_rows, encoding=encoding):
+        if keys is not None:
+            chunk = chunk[np.isin(chunk["SEQN"].to_numpy(), keys)]
+        parts.append(chunk)
+    frame = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=["SEQN"] + columns)
+    frame = frame.drop_duplicates("SEQN", keep="first").set_index("SEQN").sort_index()
+    return frame
+
+def aggregate_medications(path, chunk_rows, keys=None):
+    """One row per SEQN: medication count, longest use in days and condition flags.
+
+    Chunks are aggregated on their own and the partial results combined, so
+    the one-to-many prescription rows are never joined or held all at once.
+    """
+    partials = []
+    for chunk in pd.read_csv(path, usecols=list(MEDICATION_DTYPES), dtype=MEDICATION_DTYPES,
+                             chunksize=chunk_rows, encoding="latin1"):
+        if keys is not None:
+            chunk = chunk[np.isin(chunk["SEQN"].to_numpy(), keys)]
+        drug = chunk["RXDDRUG"]
+        reasons = chunk[["RXDRSC1", "RXDRSC2", "RXDRSC3"]].fillna("")
+        partial = pd.DataFrame({
+            "SEQN": chunk["SEQN"],
+            "rx_count": (drug.notna() & ~drug.isin(NO_DRUG)).astype(np.int16),
+            "rx_max_days": chunk["RXDDAYS"],
+        })
+        for name, prefixes in RX_CONDITIONS.items():
+            partial[name] = np.logical_or.reduce(
+                [reasons[col].str.startswith(prefixes).to_numpy() for col in reasons.columns]
+            ).astype(np.int8)
+        partials.append(partial.groupby("SEQN").agg({
+            "rx_count": "sum", "rx_max_days": "max", **{name: "max" for name in RX_CONDITIONS}
+        }))
+    if not partials:
+        return pd.DataFrame(columns=["rx_count", "rx_max_days", *RX_CONDITIONS]).rename_axis("SEQN")
+    # A participant split across two chunks has two partial rows; fold them together
+    combined = pd.concat(partials)
+    combined = combined.groupby(level=0).agg({
+        "rx_count": "sum", "rx_max_days": "max", **{name: "max" for name in RX_CONDITIONS}
+    })
+    return combined.astype({"rx_count": np.int16, **{name: np.int8 for name in RX_CONDITIONS}})
+
+def build_nhanes_master(data_dir=".", chunk_rows=50_000, output=OUTPUT, write_csv=False):
+    """Demographic, diet, examination and labs (inner join) plus per-participant medications (left join).
+
+    Every table is reduced to its needed columns, indexed and sorted by SEQN.
+    The participants present in all four are intersected once, each table is
+    aligned to that sorted key and the pieces are concatenated side by side,
+    so no chain of merge intermediates is ever materialized.
+    """
+    started = time.perf_counter()
+    tables = {}
+    keys = None
+    for name, (filename, columns) in SOURCES.items():
+        path = os.path.join(data_dir, filename)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found; download the NHANES {name} file first")
+        with step(f"read {filename}"):
+            table = read_source(path, columns, chunk_rows, keys)
+            # Each file only keeps participants every earlier file has, so memory shrinks as it goes
+            keys = table.index.to_numpy() if keys is None else np.intersect1d(keys, table.index.to_numpy())
+            tables[name] = table
+        print(f"   {name}: {len(table):,} participants x {table.shape[1]} columns, "
+              f"{table.memory_usage(deep=True).sum() / 1024 / 1024:.1f} MB")
+
+    with step("aggregate medications.csv"):
+        medications = aggregate_medications(os.path.join(data_dir, MEDICATIONS), chunk_rows, keys)
+    print(f"   medications: {len(medications):,} participants with prescription rows")
+
+    with step("align on sorted SEQN"):
+        index = pd.Index(keys, name="SEQN")
+        parts = [table.reindex(index) for table in tables.values()]
+        meds = medications.reindex(index)
+        # Participants without prescription rows take no medication
+        meds = meds.fillna({"rx_count": 0, **{name: 0 for name in RX_CONDITIONS}})
+        meds = meds.astype({"rx_count": np.int16, **{name: np.int8 for name in RX_CONDITIONS}})
+        master = pd.concat(parts + [meds], axis=1).reset_index()
+        master["SEQN"] = master["SEQN"].astype(np.int32)
+        del parts, tables
+    print(f"   master: {len(master):,} rows x {master.shape[1]} columns, "
+          f"{master.memory_usage(deep=True).sum() / 1024 / 1024:.1f} MB")
+
+    output_path = os.path.join(data_dir, output)
+    with step("write output"):
+        signature = None
+        if write_csv:
+            master.to_csv(output_path, index=False)
+            signature = source_signature(output_path)
+        out = write_columnar(master, columnar_path(output_path), "NHANES merge", signature)
+    print(f"✅ NHANES-style master dataset saved as {out}" + (f" and {output_path}" if write_csv else "")
+          + f" in {time.perf_counter() - started:.1f}s")
+    return master
+
+def build_custom_nutrition(data_dir="."):
+    """Combine cleaned macros + nutrition info"""
+    with step("custom nutrition dataset"):
+        food_macros = pd.read_csv(os.path.join(data_dir, "detailed_meals_macros_CLEANED.csv"))
+        food_nutrition = pd.read_csv(os.path.join(data_dir, "Food_and_Nutrition__.csv"))
+        custom_nutrition = pd.concat([food_macros, food_nutrition], ignore_index=True)
+        custom_nutrition.to_csv(os.path.join(data_dir, "custom_nutrition_dataset.csv"), index=False)
+    print("✅ Custom nutrition dataset saved as custom_nutrition_dataset.csv")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the NHANES master and custom nutrition datasets")
+    parser.add_argument("--data-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("--chunk-rows", type=int, default=50_000, help="Rows read per CSV chunk")
+    parser.add_argument("--csv", action="store_true", help="Also write nhanes_master_dataset.csv")
+    parser.add_argument("--skip-custom", action="store_true", help="Do not rebuild custom_nutrition_dataset.csv")
+    args = parser.parse_args()
+
+    build_nhanes_master(args.data_dir, args.chunk_rows, write_csv=args.csv)
+    if not args.skip_custom:
+        build_custom_nutrition(args.data_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import numpy as np
+from columnar_store import read_table
+
+UNKNOWN_CODE = -1
+
+class FeatureEncoder:
+    """Precompiled category -> code tables shared by the CLI, the API and the test harness.
+
+    Codes match sklearn's LabelEncoder (categories sorted as strings), so an
+    encoder built from the training frame or from the pickled LabelEncoders
+    produces the same inputs the model was trained on. Unseen categories map
+    to unknown_code instead of raising.
+    """
+
+    def __init__(self, mappings, unknown_code=UNKNOWN_CODE):
+        """mappings: {column: {category: code}}"""
+        self.mappings = mappings
+        self.unknown_code = unknown_code
+
+    @classmethod
+    def from_label_encoders(cls, label_encoders, unknown_code=UNKNOWN_CODE):
+        """Build the tables from a dict of fitted LabelEncoders"""
+        return cls.from_classes({col: le.classes_ for col, le in label_encoders.items()}, unknown_code)
+
+    @classmethod
+    def from_classes(cls, classes, unknown_code=UNKNOWN_CODE):
+        """Build the tables from {column: categories in code order}, e.g. a native model's metadata"""
+        mappings = {
+            col: {str(c): code for code, c in enumerate(categories)}
+            for col, categories in classes.items()
+        }
+        return cls(mappings, unknown_code)
+
+    @classmethod
+    def from_frame(cls, df, columns=None, unknown_code=UNKNOWN_CODE):
+        """Build the tables the way LabelEncoder.fit would, for the object columns of df"""
+        if columns is None:
+            columns = df.select_dtypes(include=["object"]).columns
+        mappings = {}
+        for col in columns:
+            categories = sorted(df[col].astype(str).unique())
+            mappings[col] = {c: code for code, c in enumerate(categories)}
+        return cls(mappings, unknown_code)
+
+    def __contains__(self, col):
+        return col in self.mappings
+
+    def encode_value(self, col, value):
+        """Encode a single category"""
+        return self.mappings[col].get(str(value), self.unknown_code)
+
+    def known(self, col, values):
+        """Boolean mask of values that have a code for col"""
+        mapping = self.mappings[col]
+        return np.fromiter((str(v) in mapping for v in values), dtype=bool, count=len(values))
+
+    def encode_column(self, col, values):
+        """Encode an iterable of categories with dict lookups; unknowns get unknown_code"""
+        mapping = self.mappings[col]
+        fallback = self.unknown_code
+        return np.array([mapping.get(str(v), fallback) for v in values])
+
+    def transform(self, df):
+        """Return a copy of df with every encodable column replaced by its codes"""
+        encoded = df.copy()
+        for col in encoded.columns:
+            if col in self.mappings:
+                encoded[col] = self.encode_column(col, encoded[col].tolist())
+        return encoded
+
+_encoder_cache = {}
+
+def build_feature_encoder(path, unknown_code=UNKNOWN_CODE):
+    """Build encoding tables from a CSV's object columns once per process"""
+    key = (path, unknown_code)
+    if key not in _encoder_cache:
+        _encoder_cache[key] = FeatureEncoder.from_frame(read_table(path), unknown_code=unknown_code)
+    return _encoder_cache[key]
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+from food_search import TrigramIndex
+from columnar_store import open_columnar
+
+class FoodCatalog:
+    """Food database with a lowercase-name hash index built once at load time.
+
+    compact() moves the rows out of the DataFrame into one NumPy array per
+    column (fixed-width strings, numeric dtypes), which pre-fork servers use
+    so that forked workers share the catalog pages instead of copying them
+    as Python reference counts change. When columnar_store.py has built an
+    up-to-date columnar copy of the CSV, the catalog memory-maps that instead
+    and starts out compacted.
+    """
+
+    def __init__(self, path, feature_cols=None, encoder=None):
+        """Load the CSV and precompute the name index and per-food feature rows"""
+        self.path = path
+        self.columns = open_columnar(path)
+        self._df = pd.read_csv(path) if self.columns is None else None
+        self.feature_cols = list(feature_cols) if feature_cols is not None else None
+        self.name_index = {}
+        self.feature_matrix = None
+        self.encoder = encoder
+        self.search_index = TrigramIndex(self._names())
+        self._build_name_index()
+        if self.feature_cols is not None:
+            self._build_feature_matrix()
+
+    def _names(self):
+        if self.columns is not None:
+            return [str(name) for name in np.asarray(self.columns['Food_Name'])]
+        return self._df['Food_Name'].astype(str).tolist()
+
+    def _build_name_index(self):
+        """Map each lowercase Food_Name to the position of its first row"""
+        for pos, name in enumerate(self._names()):
+            self.name_index.setdefault(name.lower(), pos)
+
+    def _build_feature_matrix(self):
+        """Encode feature_cols once into a float matrix (NaN where a category is unknown)"""
+        self.feature_matrix = self._encode_frame(self.df)
+
+    def _encode_frame(self, df):
+        matrix = np.empty((len(df), len(self.feature_cols)), dtype=np.float64)
+        for j, col in enumerate(self.feature_cols):
+            values = df[col]
+            if self.encoder is not None and col in self.encoder:
+                mapping = self.encoder.mappings[col]
+                matrix[:, j] = values.astype(str).map(mapping).astype(float).to_numpy()
+            else:
+                matrix[:, j] = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+        return matrix
+
+    @property
+    def df(self):
+        """The catalog as a DataFrame; rebuilt from the column arrays when compacted"""
+        if self.columns is not None:
+            return pd.DataFrame({col: np.asarray(values) for col, values in self.columns.items()})
+        return self._df
+
+    def compact(self):
+        """Replace the DataFrame with per-column NumPy arrays"""
+        if self.columns is None:
+            self.columns = {}
+            for col in self._df.columns:
+                values = self._df[col]
+                if not pd.api.types.is_numeric_dtype(values):
+                    self.columns[col] = np.array(values.astype(str).tolist(), dtype=str)
+                else:
+                    self.columns[col] = values.to_numpy()
+            self._df = None
+        self.search_index.compact()
+
+    def _rows(self, positions):
+        if self.columns is not None:
+            return pd.DataFrame({col: values[positions] for col, values in self.columns.items()})
+        return self._df.iloc[positions]
+
+    def __len__(self):
+        if self.columns is not None:
+            return len(self.search_index)
+        return len(self._df)
+
+    def find(self, food_name):
+        """Return the row position for an exact (case-insensitive) name, or None"""
+        if not food_name:
+            return None
+        return self.name_index.get(str(food_name).lower())
+
+    def get_record(self, pos):
+        """Return all columns of a row as a dict"""
+        if self.columns is not None:
+            return {col: values.item(pos) for col, values in self.columns.items()}
+        return self._df.iloc[pos].to_dict()
+
+    def get_features(self, pos):
+        """Return the raw (unencoded) feature_cols of a row as a dict"""
+        record = self.get_record(pos)
+        return {col: record[col] for col in self.feature_cols}
+
+    def get_feature_row(self, pos):
+        """Return the precomputed encoded feature row for a food"""
+        return self.feature_matrix[pos]
+
+    def search(self, query, limit=10, prefix=False):
+        """Return up to limit rows whose name contains (or starts with) query, in catalog order"""
+        positions = self.search_index.search(query, limit=limit, prefix=prefix)
+        return self._rows(positions)
+
+    def add_food(self, record):
+        """Append a food and update the name index, search index and feature matrix"""
+        pos = len(self)
+        if self.columns is not None:
+            row = pd.DataFrame([record], columns=list(self.columns))
+            for col, values in self.columns.items():
+                values = np.asarray(values)
+                value = np.array(row[col].astype(str).tolist(), dtype=str) if values.dtype.kind == "U" else row[col].to_numpy()
+                self.columns[col] = np.append(values, value)
+        else:
+            row = pd.DataFrame([record], columns=self._df.columns)
+            self._df = pd.concat([self._df, row], ignore_index=True)
+        name = str(record.get('Food_Name', ''))
+        self.search_index.add(name)
+        self.name_index.setdefault(name.lower(), pos)
+        if self.feature_matrix is not None:
+            encoded = self._encode_frame(row)
+            self.feature_matrix = np.vstack([self.feature_matrix, encoded])
+        return pos
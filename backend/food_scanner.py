@@ -1,24 +1,37 @@
 import pandas as pd
-import pickle
-from sklearn.preprocessing import LabelEncoder
+from model_store import load_model
+from feature_encoding import FeatureEncoder
+from food_catalog import FoodCatalog
+from prediction_cache import PredictionCache
+from nutrition_rules import default_engine
 
 class FoodScanner:
     """Interactive Food Scanner for disease risk analysis"""
 
-    def __init__(self):
-        """Initialize the food scanner with trained models and database"""
+    def __init__(self, backend=None):
+        """Initialize the food scanner with trained models and database.
+
+        backend: "xgboost" or "compiled" (NumPy tree traversal); defaults to
+        the INFERENCE_BACKEND environment variable, then "xgboost".
+        """
+        self.backend = backend
         self.model = None
         self.label_encoder_y = None
         self.food_db = None
-        self.encoders = {}
+        self.catalog = None
+        self.encoder = None
+        self.prediction_cache = PredictionCache()
         self.load_models()
         self.load_food_database()
 
     def load_models(self):
         """Load the trained food analysis model and encoders"""
         try:
-            self.model = pickle.load(open("models/xgboost_model.pkl", "rb"))
-            self.label_encoder_y = pickle.load(open("models/label_encoder_y.pkl", "rb"))
+            self.model, self.label_encoder_y, _ = load_model(
+                "models/xgboost_model.pkl", "models/label_encoder_y.pkl", "models/xgboost_model",
+                backend=self.backend
+            )
+            self.prediction_cache.clear()
             # Optionally load feature encoders if needed
         except Exception as e:
             print(f"❌ Error loading models: {e}")
@@ -28,20 +41,21 @@ class FoodScanner:
     def load_food_database(self):
         """Load the food database"""
         try:
-            self.food_db = pd.read_csv("data/food_database.csv")
+            self.catalog = FoodCatalog("data/food_database.csv")
+            self.food_db = self.catalog.df
+            self.encoder = FeatureEncoder.from_frame(self.food_db)
         except Exception as e:
             print(f"❌ Error loading food database: {e}")
+            self.catalog = None
             self.food_db = None
+            self.encoder = None
 
     def search_food(self, query):
         """Search for food items in the database"""
-        if self.food_db is None:
+        if self.catalog is None:
             return pd.DataFrame()
-        query = query.lower()
-        matches = self.food_db[
-            self.food_db['Food_Name'].str.lower().str.contains(query, na=False)
-        ]
-        return matches[['Food_Name', 'Food_Category', 'Calories_per_100g', 'Processing_Level', 'Nutritional_Density']].head(10)
+        matches = self.catalog.search(query, limit=10)
+        return matches[['Food_Name', 'Food_Category', 'Calories_per_100g', 'Processing_Level', 'Nutritional_Density']]
 
     def analyze_food_item(self, food_name=None, nutritional_data=None):
         """Analyze a food item for disease risk"""
@@ -49,10 +63,10 @@ class FoodScanner:
             return {"error": "Model not loaded"}
 
         # If food_name provided, get from database
-        if food_name and self.food_db is not None:
-            row = self.food_db[self.food_db['Food_Name'].str.lower() == food_name.lower()]
-            if not row.empty:
-                nutritional_data = row.iloc[0].to_dict()
+        if food_name and self.catalog is not None:
+            pos = self.catalog.find(food_name)
+            if pos is not None:
+                nutritional_data = self.catalog.get_record(pos)
 
         # If nutritional_data is still None, return error
         if nutritional_data is None:
@@ -61,97 +75,36 @@ class FoodScanner:
         # Prepare DataFrame
         df = pd.DataFrame([nutritional_data])
 
-        # Encode categorical features if needed
-        for col in df.select_dtypes(include=["object"]).columns:
-            if col in self.food_db.columns:
-                le = LabelEncoder()
-                le.fit(self.food_db[col].astype(str))
-                df[col] = le.transform(df[col].astype(str))
+        # Encode categorical features with the precompiled tables
+        if self.encoder is not None:
+            df = self.encoder.transform(df)
 
-        # Make prediction
+        # Make prediction, reusing a cached one for a previously seen feature vector
         try:
-            pred = self.model.predict(df)
-            probabilities = self.model.predict_proba(df)[0]
-            max_prob = max(probabilities)
-            predicted_disease = self.label_encoder_y.inverse_transform(pred)[0]
-            all_probs = dict(zip(self.label_encoder_y.classes_, probabilities))
+            key = self.prediction_cache.make_key(df.iloc[0].tolist(), df.columns)
+            prediction = self.prediction_cache.get(key)
+            if prediction is None:
+                probabilities = self.model.predict_proba(df)[0]
+                best = probabilities.argmax()
+                prediction = {
+                    "predicted_disease": self.label_encoder_y.inverse_transform([best])[0],
+                    "confidence": probabilities[best],
+                    "all_probabilities": dict(zip(self.label_encoder_y.classes_, probabilities))
+                }
+                self.prediction_cache.put(key, prediction)
             analysis = self.get_nutritional_analysis(nutritional_data)
             return {
                 "food_name": food_name or nutritional_data.get("Food_Name", "Unknown"),
-                "predicted_disease": predicted_disease,
-                "confidence": max_prob,
-                "all_probabilities": all_probs,
+                **prediction,
                 "nutritional_analysis": analysis
             }
         except Exception as e:
             return {"error": f"Prediction error: {e}"}
 
-    def get_nutritional_analysis(self, nutritional_data):
+    @staticmethod
+    def get_nutritional_analysis(nutritional_data):
         """Provide nutritional analysis and recommendations"""
-        analysis = {
-            "health_score": 0,
-            "concerns": [],
-            "recommendations": []
-        }
-        score = 100
-
-        # Processing level impact
-        if nutritional_data.get('Processing_Level', 0) > 7:
-            score -= 25
-            analysis["concerns"].append("Highly processed food")
-        elif nutritional_data.get('Processing_Level', 0) > 5:
-            score -= 10
-            analysis["concerns"].append("Moderately processed food")
-
-        # Nutritional density impact
-        if nutritional_data.get('Nutritional_Density', 10) < 5:
-            score -= 15
-            analysis["concerns"].append("Low nutritional density")
-
-        # Sugar content
-        if nutritional_data.get('Sugar_per_100g', 0) > 15:
-            score -= 15
-            analysis["concerns"].append("High sugar content")
-        elif nutritional_data.get('Sugar_per_100g', 0) > 10:
-            score -= 7
-            analysis["concerns"].append("Moderate sugar content")
-
-        # Sodium content
-        if nutritional_data.get('Sodium_per_100g', 0) > 400:
-            score -= 15
-            analysis["concerns"].append("Very high sodium content")
-        elif nutritional_data.get('Sodium_per_100g', 0) > 200:
-            score -= 7
-            analysis["concerns"].append("Moderate sodium content")
-
-        # Fat content
-        if nutritional_data.get('Fat_per_100g', 0) > 20:
-            score -= 10
-            analysis["concerns"].append("High fat content")
-
-        # Fiber content
-        if nutritional_data.get('Fiber_per_100g', 10) < 3:
-            score -= 10
-            analysis["concerns"].append("Low fiber content")
-
-        # Additives
-        if nutritional_data.get('Additives_Count', 0) > 5:
-            score -= 10
-            analysis["concerns"].append("Contains many additives")
-
-        analysis["health_score"] = max(0, score)
-
-        # Generate recommendations
-        if score < 50:
-            analysis["recommendations"].append("Consider healthier alternatives with less processing and additives.")
-        if nutritional_data.get('Processing_Level', 0) > 5:
-            analysis["recommendations"].append("Choose less processed foods.")
-        if nutritional_data.get('Sugar_per_100g', 0) > 10:
-            analysis["recommendations"].append("Reduce sugar intake.")
-        if nutritional_data.get('Sodium_per_100g', 0) > 200:
-            analysis["recommendations"].append("Reduce sodium intake.")
-
-        return analysis
+        return default_engine().analyze(nutritional_data)
 
     def get_food_categories(self):
         """Get all available food categories"""
@@ -1,71 +1,187 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import pickle
-import pandas as pd
+import os
+import threading
+from nutrition_rules import default_engine
+from food_service import registry, current_bundle, prediction_cache
+from model_registry import ReloadInProgress
+from label_reader import FoodLabelReader, get_ocr_backend, label_to_features
+from scan_jobs import ScanJobQueue, QueueFull
 
 app = Flask(__name__)
 CORS(app)
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("SCAN_MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+ADMIN_TOKEN = os.environ.get("MODEL_ADMIN_TOKEN")
+MAX_BATCH_ITEMS = int(os.environ.get("MAX_BATCH_ITEMS", 1000))
 
-try:
-    print("Loading model and encoders...")
-    model = pickle.load(open("models/food_analysis_model.pkl", "rb"))
-    label_encoder_y = pickle.load(open("models/food_label_encoder_y.pkl", "rb"))
-    label_encoders = pickle.load(open("models/food_feature_encoders.pkl", "rb"))
-    feature_cols = pickle.load(open("models/food_feature_names.pkl", "rb"))
-    food_db = pd.read_csv("data/food_database_fixed.csv")
-    print("✅ Model and encoders loaded successfully.")
-except Exception as e:
-    print(f"❌ Error loading model or data: {e}")
-
-# Load model and encoders
-model = pickle.load(open("models/food_analysis_model.pkl", "rb"))
-label_encoder_y = pickle.load(open("models/food_label_encoder_y.pkl", "rb"))
-label_encoders = pickle.load(open("models/food_feature_encoders.pkl", "rb"))
-feature_cols = pickle.load(open("models/food_feature_names.pkl", "rb"))
-food_db = pd.read_csv("data/food_database_fixed.csv")
+@app.before_request
+def watch_models():
+    # Started from the first request so pre-forked workers each get their own watcher
+    registry.watch()
+
+@app.after_request
+def add_model_version(response):
+    response.headers["X-Model-Version"] = registry.current.version
+    return response
 
 @app.route("/api/search_food", methods=["GET"])
 def search_food():
     query = request.args.get("query", "")
-    matches = food_db[food_db['Food_Name'].str.lower().str.contains(query.lower(), na=False)]
-    return matches[['Food_Name', 'Food_Category', 'Calories_per_100g']].head(10).to_json(orient="records")
+    return jsonify(current_bundle().search_foods(query, prefix=request.args.get("prefix") == "1"))
 
 @app.route("/api/analyze_food", methods=["POST"])
 def analyze_food():
-    data = request.json
-    food_name = data.get("food_name")
-    nutritional_data = data.get("nutritional_data")
-
-    # If food_name is given, get its data from DB
-    if food_name:
-        row = food_db[food_db['Food_Name'].str.lower() == food_name.lower()]
-        if not row.empty:
-            nutritional_data = row.iloc[0][feature_cols].to_dict()
-
-    if nutritional_data is None:
-        return jsonify({"error": "No nutritional data provided"}), 400
-
-    # Prepare DataFrame
-    df = pd.DataFrame([nutritional_data])
-    # Encode categorical features
-    for col in df.select_dtypes(include=["object"]).columns:
-        if col in label_encoders:
-            le = label_encoders[col]
-            df[col] = le.transform(df[col].astype(str))
-
-    # Predict
-    pred = model.predict(df[feature_cols])
-    probabilities = model.predict_proba(df[feature_cols])[0]
-    max_prob = max(probabilities)
-    predicted_disease = label_encoder_y.inverse_transform(pred)[0]
-    all_probs = dict(zip(label_encoder_y.classes_, probabilities))
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object body"}), 400
+    payload, status = current_bundle().analyze_food(data.get("food_name"), data.get("nutritional_data"))
+    return jsonify(payload), status
+
+@app.route("/api/analyze_food/batch", methods=["POST"])
+def analyze_food_batch():
+    """Score many foods in one request; results come back in input order"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object body"}), 400
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Expected a non-empty 'items' list"}), 400
+    if len(items) > MAX_BATCH_ITEMS:
+        return jsonify({"error": f"Too many items: {len(items)} (limit {MAX_BATCH_ITEMS})"}), 413
+
+    bundle = current_bundle()
+    catalog = bundle.catalog
+    names = []
+    records = []
+    catalog_rows = {}
+    for i, item in enumerate(items):
+        if isinstance(item, str):
+            item = {"food_name": item}
+        elif not isinstance(item, dict):
+            item = {}
+        food_name = item.get("food_name")
+        nutritional_data = item.get("nutritional_data")
+        pos = catalog.find(food_name)
+        if pos is not None:
+            catalog_rows[i] = pos
+        if not food_name and isinstance(nutritional_data, dict):
+            food_name = nutritional_data.get("Food_Name")
+        names.append(food_name or "Unknown")
+        records.append(None if pos is not None else nutritional_data)
+
+    matrix, errors = bundle.encode_records(records)
+    resolved = errors
+    risk_table = bundle.risk_table
+    for i, pos in catalog_rows.items():
+        resolved.pop(i, None)
+        if risk_table is not None and risk_table.get(pos) is not None:
+            resolved[i] = risk_table.get(pos)
+        else:
+            matrix[i] = catalog.get_feature_row(pos)
+
+    results = []
+    for name, result in zip(names, bundle.score_matrix_cached(matrix, resolved)):
+        results.append({"food_name": name, **result})
+    return jsonify({"count": len(results), "results": results, "model_version": bundle.version})
+
+# Label photos are OCR'd off the request path by a bounded pool of worker threads
+SCAN_WORKERS = int(os.environ.get("SCAN_WORKERS", 2))
+_scan_state = threading.local()
+
+def _label_reader():
+    """One FoodLabelReader per scan worker thread, sharing the process's OCR engines"""
+    reader = getattr(_scan_state, "reader", None)
+    if reader is None:
+        reader = FoodLabelReader(ocr_backend=get_ocr_backend("auto", workers=SCAN_WORKERS))
+        _scan_state.reader = reader
+    return reader
+
+def process_label_scan(image_bytes):
+    """OCR a label photo and run the extracted values through the food model"""
+    label = _label_reader().read_food_label(image_bytes)
+    if "error" in label:
+        raise ValueError(label["error"])
+    features = label_to_features(label)
+    bundle = current_bundle()
+    result = bundle.score_records([features])[0]
+    if "error" in result:
+        raise ValueError(result["error"])
+    return {
+        **result,
+        "model_version": bundle.version,
+        "nutritional_data": features,
+        "nutritional_analysis": default_engine().analyze(features),
+        "label": label
+    }
 
+scan_queue = ScanJobQueue(
+    process_label_scan,
+    workers=SCAN_WORKERS,
+    max_queue=int(os.environ.get("SCAN_QUEUE_SIZE", 64))
+)
+
+@app.route("/api/scan_label", methods=["POST"])
+def scan_label():
+    """Queue a label photo (multipart field 'image' or the raw request body) and return its job id"""
+    upload = request.files.get("image")
+    image_bytes = upload.read() if upload is not None else request.get_data()
+    if not image_bytes:
+        return jsonify({"error": "No image provided"}), 400
+    try:
+        job_id = scan_queue.submit(image_bytes)
+    except QueueFull as e:
+        response = jsonify({"error": str(e)})
+        response.headers["Retry-After"] = "5"
+        return response, 503
     return jsonify({
-        "food_name": food_name or nutritional_data.get("Food_Name", "Unknown"),
-        "predicted_disease": predicted_disease,
-        "confidence": max_prob,
-        "all_probabilities": all_probs
-    })
+        "job_id": job_id,
+        "status": "queued",
+        "queue_depth": scan_queue.stats()["queue_depth"]
+    }), 202
+
+@app.route("/api/scan_label/<job_id>", methods=["GET"])
+def scan_label_status(job_id):
+    job = scan_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    return jsonify(job)
+
+@app.route("/api/scan_queue_stats", methods=["GET"])
+def scan_queue_stats():
+    return jsonify(scan_queue.stats())
+
+@app.route("/api/cache_stats", methods=["GET"])
+def cache_stats():
+    return jsonify(prediction_cache.stats())
+
+@app.route("/api/batch_stats", methods=["GET"])
+def batch_stats():
+    batcher = current_bundle().batcher
+    return jsonify(batcher.stats() if batcher is not None else {"enabled": False})
+
+@app.route("/api/model_version", methods=["GET"])
+def model_version():
+    return jsonify(registry.status())
+
+@app.route("/api/admin/reload_model", methods=["POST"])
+def reload_model():
+    """Load and warm the artifacts on disk in the background, then swap them in"""
+    if ADMIN_TOKEN is not None:
+        if request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+            return jsonify({"error": "Invalid admin token"}), 403
+    elif request.remote_addr not in ("127.0.0.1", "::1"):
+        return jsonify({"error": "Set MODEL_ADMIN_TOKEN to allow remote reloads"}), 403
+    if request.args.get("wait") == "1":
+        try:
+            bundle = registry.reload("admin request")
+        except ReloadInProgress as e:
+            return jsonify({"error": str(e)}), 409
+        except Exception as e:
+            return jsonify({"error": f"Reload failed: {e}", **registry.status()}), 500
+        return jsonify({"loaded_version": bundle.version, **registry.status()})
+    if not registry.reload_async("admin request"):
+        return jsonify({"error": "A model reload is already in progress"}), 409
+    return jsonify({"status": "reloading", "active_version": registry.current.version}), 202
 
 @app.route("/")
 def home():
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+from fastapi import FastAPI, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from model_registry import ReloadInProgress
+
+def service():
+    """food_service, imported on first use so a launcher process never loads the artifacts itself"""
+    import food_service
+    return food_service
+
+# Model inference is CPU-bound; it runs here so the event loop keeps serving requests
+predict_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("PREDICT_THREADS", os.cpu_count() or 1)),
+    thread_name_prefix="predict"
+)
+
+app = FastAPI(title="Food Scanner API")
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+ADMIN_TOKEN = os.environ.get("MODEL_ADMIN_TOKEN")
+
+@app.exception_handler(RequestValidationError)
+async def validation_error(request: Request, exc: RequestValidationError):
+    # Same status and shape as the Flask app's errors, instead of FastAPI's 422 detail list
+    error = exc.errors()[0]
+    field = ".".join(part for part in error["loc"] if isinstance(part, str) and part != "body") or "body"
+    return JSONResponse({"error": f"Invalid {field}: {error['msg']}"}, status_code=400)
+
+@app.middleware("http")
+async def add_model_version(request: Request, call_next):
+    # The watcher starts with the first request, so each worker process gets its own
+    service().registry.watch()
+    response = await call_next(request)
+    response.headers["X-Model-Version"] = service().registry.current.version
+    return response
+
+class AnalyzeRequest(BaseModel):
+    food_name: Optional[str] = None
+    # Checked by food_service, so a non-object gets the same error as from the Flask app
+    nutritional_data: Optional[Any] = None
+
+async def run_in_pool(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(predict_pool, func, *args)
+
+@app.get("/api/search_food")
+async def search_food(query: str = "", prefix: str = ""):
+    return await run_in_pool(service().current_bundle().search_foods, query, prefix == "1")
+
+@app.post("/api/analyze_food")
+async def analyze_food(data: AnalyzeRequest):
+    bundle = service().current_bundle()
+    payload, status = await run_in_pool(bundle.analyze_food, data.food_name, data.nutritional_data)
+    return JSONResponse(payload, status_code=status)
+
+@app.get("/api/batch_stats")
+async def batch_stats():
+    batcher = service().current_bundle().batcher
+    return batcher.stats() if batcher is not None else {"enabled": False}
+
+@app.get("/api/model_version")
+async def model_version():
+    return service().registry.status()
+
+@app.post("/api/admin/reload_model")
+async def reload_model(request: Request, wait: str = ""):
+    """Load and warm the artifacts on disk in the background, then swap them in"""
+    registry = service().registry
+    if ADMIN_TOKEN is not None:
+        if request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+            return JSONResponse({"error": "Invalid admin token"}, status_code=403)
+    elif request.client is None or request.client.host not in ("127.0.0.1", "::1"):
+        return JSONResponse({"error": "Set MODEL_ADMIN_TOKEN to allow remote reloads"}, status_code=403)
+    if wait == "1":
+        try:
+            bundle = await run_in_pool(registry.reload, "admin request")
+        except ReloadInProgress as e:
+            return JSONResponse({"error": str(e)}, status_code=409)
+        except Exception as e:
+            return JSONResponse({"error": f"Reload failed: {e}", **registry.status()}, status_code=500)
+        return {"loaded_version": bundle.version, **registry.status()}
+    if not registry.reload_async("admin request"):
+        return JSONResponse({"error": "A model reload is already in progress"}, status_code=409)
+    return JSONResponse({"status": "reloading", "active_version": registry.current.version}, status_code=202)
+
+@app.get("/")
+async def home():
+    return "Food Scanner API is running!"
+
+def default_workers():
+    """One worker per core: prediction is CPU-bound, so more only adds contention"""
+    return int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+
+def main():
+    """Production launcher.
+
+    With gunicorn installed (POSIX only) the app and artifacts are loaded once
+    in the master (preload) and forked into uvicorn workers, sharing them
+    copy-on-write. Otherwise uvicorn's own process manager starts the
+    workers, each loading the artifacts once; this process never loads them.
+    """
+    parser = argparse.ArgumentParser(description="Serve the Food Scanner API over ASGI")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("-w", "--workers", type=int, default=default_workers(), help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    print(f"🚀 Starting Food Scanner API on {args.host}:{args.port} with {args.workers} workers...")
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        import uvicorn
+        if args.workers == 1:
+            uvicorn.run(app, host=args.host, port=args.port)
+        else:
+            uvicorn.run("food_scanner_asgi:app", host=args.host, port=args.port, workers=args.workers)
+        return
+
+    class PreloadedApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{args.host}:{args.port}")
+            self.cfg.set("workers", args.workers)
+            self.cfg.set("worker_class", "uvicorn.workers.UvicornWorker")
+            self.cfg.set("preload_app", True)
+
+        def load(self):
+            service()
+            return app
+
+    PreloadedApplication().run()
+
+if __name__ == "__main__":
+    main()
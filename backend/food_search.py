@@ -0,0 +1,92 @@
+from bisect import bisect_left
+import numpy as np
+
+PREFIX_MARK = "\x02"
+GRAM_SIZE = 3
+
+class TrigramIndex:
+    """Inverted n-gram index over food names for substring and prefix search.
+
+    Every name is indexed under all of its 1-, 2- and 3-grams, plus the same
+    grams of the name anchored with PREFIX_MARK so prefix queries can be
+    answered from the index too. Posting lists hold document ids in ascending
+    order, so results come back in insertion (catalog) order, which keeps the
+    ranking stable and lets a query stop as soon as it has `limit` hits.
+    """
+
+    def __init__(self, names=None):
+        """Build the index from an iterable of names; ids are their positions"""
+        self.names = []
+        self.postings = {}
+        for name in (names if names is not None else []):
+            self.add(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    @staticmethod
+    def _grams(text):
+        """All distinct substrings of text up to GRAM_SIZE characters"""
+        grams = set()
+        for size in range(1, GRAM_SIZE + 1):
+            for i in range(len(text) - size + 1):
+                grams.add(text[i:i + size])
+        return grams
+
+    @staticmethod
+    def _query_grams(text):
+        """The grams that every name containing text must be indexed under"""
+        if len(text) <= GRAM_SIZE:
+            return {text}
+        return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+    def add(self, name):
+        """Index one more name and return its id"""
+        doc_id = len(self.names)
+        text = str(name).lower()
+        grams = self._grams(text) | self._grams(PREFIX_MARK + text[:GRAM_SIZE - 1])
+        if isinstance(self.names, np.ndarray):
+            # Compacted index: grow copies of the arrays
+            self.names = np.append(self.names, text)
+            for gram in grams:
+                self.postings[gram] = np.append(self.postings.get(gram, np.empty(0, dtype=np.int32)), doc_id)
+        else:
+            self.names.append(text)
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(doc_id)
+        return doc_id
+
+    def compact(self):
+        """Store names and posting lists as NumPy arrays instead of lists of Python objects"""
+        self.names = np.array(self.names, dtype=str)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in self.postings.items()}
+
+    def search(self, query, limit=10, prefix=False):
+        """Return up to limit ids whose name contains (or starts with) query"""
+        query = str(query).lower()
+        if not query:
+            return list(range(min(limit, len(self.names))))
+
+        key = PREFIX_MARK + query if prefix else query
+        grams = self._query_grams(key)
+        lists = [self.postings.get(gram) for gram in grams]
+        if any(posting is None or len(posting) == 0 for posting in lists):
+            return []
+        lists.sort(key=len)
+        smallest, others = lists[0], lists[1:]
+
+        results = []
+        for doc_id in smallest:
+            if not all(self._contains(posting, doc_id) for posting in others):
+                continue
+            name = self.names[doc_id]
+            if name.startswith(query) if prefix else query in name:
+                results.append(int(doc_id))
+                if len(results) >= limit:
+                    break
+        return results
+
+    @staticmethod
+    def _contains(posting, doc_id):
+        i = bisect_left(posting, doc_id)
+        return i < len(posting) and posting[i] == doc_id
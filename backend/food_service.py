@@ -0,0 +1,284 @@
+import os
+import time
+import pickle
+import numpy as np
+import pandas as pd
+from food_catalog import FoodCatalog
+from feature_encoding import FeatureEncoder
+from risk_table import ARTIFACT_PATHS, artifact_fingerprint, load_or_build_risk_table
+from prediction_cache import PredictionCache
+from model_store import load_model
+from micro_batching import MicroBatcher
+from tree_inference import TreeEnsemble
+from model_registry import ModelRegistry
+
+# Repeated feature vectors (popular products scanned by many users) skip the model.
+# Keys carry the model version, so bundles never serve each other's predictions.
+prediction_cache = PredictionCache(
+    maxsize=int(os.environ.get("PREDICTION_CACHE_SIZE", 4096)),
+    ttl=float(os.environ["PREDICTION_CACHE_TTL"]) if os.environ.get("PREDICTION_CACHE_TTL") else None
+)
+
+class ModelBundle:
+    """One model version: artifacts, catalog and everything derived from them.
+
+    A bundle is never modified after loading. Requests take one bundle
+    (current_bundle()) and use only it, so a hot reload never mixes two
+    models in one response.
+    """
+
+    def __init__(self, version, model, label_encoder_y, feature_cols, encoder, catalog):
+        self.version = version
+        self.model = model
+        self.label_encoder_y = label_encoder_y
+        self.feature_cols = feature_cols
+        self.encoder = encoder
+        self.catalog = catalog
+        self.loaded_at = time.time()
+
+        # Concurrent single-food requests share one XGBoost call. The compiled backend
+        # is already cheap per row, so batching there only adds the window as latency.
+        default_window = 0 if isinstance(model, TreeEnsemble) else 2
+        batch_window = float(os.environ.get("PREDICT_BATCH_WINDOW_MS", default_window)) / 1000
+        self.batcher = MicroBatcher(
+            self.score_matrix,
+            window=batch_window,
+            max_batch=int(os.environ.get("PREDICT_MAX_BATCH", 64))
+        ) if batch_window > 0 else None
+
+        # Optional precomputed predictions for every catalog food, rebuilt when the artifacts change
+        self.risk_table = None
+        if os.environ.get("FOOD_RISK_TABLE") == "1":
+            self.risk_table = load_or_build_risk_table(catalog, self.score_matrix)
+
+    def encode_records(self, records):
+        """Encode a list of nutritional_data dicts into one feature matrix.
+
+        Returns (matrix, errors) where errors maps input positions that could not
+        be encoded (missing record, missing features, unknown categories,
+        non-numeric values) to an error dict; those rows of the matrix are left
+        as NaN.
+        """
+        feature_cols = self.feature_cols
+        errors = {}
+        valid = []
+        for i, record in enumerate(records):
+            if record is None:
+                errors[i] = {"error": "No nutritional data provided"}
+                continue
+            if not isinstance(record, dict):
+                errors[i] = {"error": "nutritional_data must be an object"}
+                continue
+            missing = [col for col in feature_cols if col not in record]
+            if missing:
+                errors[i] = {"error": f"Missing features: {', '.join(missing)}"}
+                continue
+            valid.append(i)
+
+        matrix = np.full((len(records), len(feature_cols)), np.nan)
+        if not valid:
+            return matrix, errors
+
+        df = pd.DataFrame([records[i] for i in valid], columns=feature_cols)
+        ok = np.ones(len(valid), dtype=bool)
+        for col in feature_cols:
+            values = df[col].tolist()
+            if col not in self.encoder:
+                # A value that is present but not a number fails its own row only
+                numeric = pd.to_numeric(df[col], errors="coerce")
+                invalid = (numeric.isna() & df[col].notna()).to_numpy()
+                for pos in np.flatnonzero(invalid & ok):
+                    errors[valid[pos]] = {"error": f"Invalid value for {col}: {values[pos]}"}
+                ok &= ~invalid
+                df[col] = numeric.astype(np.float64)
+                continue
+            known = self.encoder.known(col, values)
+            for pos in np.flatnonzero(~known & ok):
+                errors[valid[pos]] = {"error": f"Unknown {col}: {values[pos]}"}
+            ok &= known
+            df[col] = self.encoder.encode_column(col, values)
+
+        rows = np.asarray(valid)[ok]
+        matrix[rows] = df[ok].to_numpy(dtype=np.float64)
+        return matrix, errors
+
+    def score_matrix(self, matrix, resolved=None):
+        """Score an encoded feature matrix with a single predict_proba call.
+
+        Returns one result dict per row, in order; rows listed in resolved
+        (errors or precomputed results) are skipped and keep that dict instead.
+        """
+        resolved = resolved or {}
+        results = [resolved.get(i) for i in range(len(matrix))]
+        rows = [i for i in range(len(matrix)) if i not in resolved]
+        if not rows:
+            return results
+
+        # Columns are already in feature_cols order, so the model gets the bare array
+        probabilities = self.model.predict_proba(matrix[rows])
+        best = probabilities.argmax(axis=1)
+        predicted = self.label_encoder_y.inverse_transform(best)
+        classes = self.label_encoder_y.classes_
+        for i, probs, idx, disease in zip(rows, probabilities, best, predicted):
+            results[i] = {
+                "predicted_disease": disease,
+                "confidence": float(probs[idx]),
+                "all_probabilities": dict(zip(classes, probs.tolist()))
+            }
+        return results
+
+    def score_matrix_batched(self, matrix, resolved=None):
+        """score_matrix, sending small calls through the micro-batcher"""
+        resolved = resolved or {}
+        rows = [i for i in range(len(matrix)) if i not in resolved]
+        if self.batcher is None or not rows or len(rows) >= self.batcher.max_batch:
+            return self.score_matrix(matrix, resolved)
+        results = [resolved.get(i) for i in range(len(matrix))]
+        for i, result in zip(rows, self.batcher.submit(matrix[rows])):
+            results[i] = result
+        return results
+
+    def score_matrix_cached(self, matrix, resolved=None):
+        """score_matrix, serving repeated feature vectors from prediction_cache"""
+        resolved = dict(resolved or {})
+        keys = {}
+        for i in range(len(matrix)):
+            if i in resolved:
+                continue
+            key = (self.version, prediction_cache.make_key(matrix[i]))
+            hit = prediction_cache.get(key)
+            if hit is not None:
+                resolved[i] = hit
+            else:
+                keys[i] = key
+        results = self.score_matrix_batched(matrix, resolved)
+        for i, key in keys.items():
+            prediction_cache.put(key, results[i])
+        return results
+
+    def score_records(self, records):
+        """Encode and score a list of nutritional_data dicts, returning results in input order"""
+        matrix, errors = self.encode_records(records)
+        return self.score_matrix_cached(matrix, errors)
+
+    def score_catalog_row(self, pos):
+        """Result for a catalog food, from the risk table when available"""
+        if self.risk_table is not None:
+            result = self.risk_table.get(pos)
+            if result is not None:
+                return result
+        return self.score_matrix_batched(self.catalog.get_feature_row(pos)[None, :])[0]
+
+    def search_foods(self, query, prefix=False, limit=10):
+        """Catalog matches for a search box query, as the records /api/search_food returns"""
+        matches = self.catalog.search(query, limit=limit, prefix=prefix)
+        return matches[['Food_Name', 'Food_Category', 'Calories_per_100g']].to_dict(orient="records")
+
+    def analyze_food(self, food_name=None, nutritional_data=None):
+        """Risk prediction for a catalog food or a nutritional_data dict; returns (payload, status)"""
+        # If food_name is given, use its precomputed feature row from the catalog
+        pos = self.catalog.find(food_name)
+        if pos is not None:
+            result = self.score_catalog_row(pos)
+        elif nutritional_data is None:
+            return {"error": "No nutritional data provided"}, 400
+        elif not isinstance(nutritional_data, dict):
+            return {"error": "nutritional_data must be an object"}, 400
+        else:
+            result = self.score_records([nutritional_data])[0]
+        if "error" in result:
+            return result, 400
+
+        return {
+            "food_name": food_name or nutritional_data.get("Food_Name", "Unknown"),
+            **result,
+            "model_version": self.version
+        }, 200
+
+    def warm(self, rows=8):
+        """Run a few catalog foods and a search through the new bundle before it serves traffic"""
+        n = min(rows, len(self.catalog))
+        if n:
+            self.score_matrix(np.stack([self.catalog.get_feature_row(pos) for pos in range(n)]))
+        self.search_foods("a")
+
+    def close(self):
+        """Retire the bundle once it has been swapped out"""
+        if self.batcher is not None:
+            self.batcher.close()
+
+def load_bundle():
+    """Load, warm and return a ModelBundle for the artifacts currently on disk"""
+    print("Loading model and encoders...")
+    model, label_encoder_y, meta = load_model(
+        "models/food_analysis_model.pkl", "models/food_label_encoder_y.pkl", "models/food_analysis_model"
+    )
+    # Fingerprint after loading, which may have compiled the trees, so it matches the risk table's
+    version = artifact_fingerprint()[:12]
+    if meta is not None:
+        feature_cols = meta["feature_names"]
+        encoder = FeatureEncoder.from_classes(meta["feature_encoders"])
+    else:
+        label_encoders = pickle.load(open("models/food_feature_encoders.pkl", "rb"))
+        feature_cols = pickle.load(open("models/food_feature_names.pkl", "rb"))
+        encoder = FeatureEncoder.from_label_encoders(label_encoders)
+    catalog = FoodCatalog("data/food_database_fixed.csv", feature_cols, encoder)
+    bundle = ModelBundle(version, model, label_encoder_y, feature_cols, encoder, catalog)
+    bundle.warm()
+    print(f"✅ Model {version} and encoders loaded successfully.")
+    return bundle
+
+def on_model_reload(old=None, new=None):
+    """Drop state derived from the previous model; called after every bundle swap"""
+    prediction_cache.clear()
+    if old is not None:
+        old.close()
+
+# The active bundle lives in the registry; MODEL_WATCH_INTERVAL (seconds, 0 = off)
+# controls how often the artifact files are checked for a new version
+registry = ModelRegistry(
+    load_bundle,
+    ARTIFACT_PATHS,
+    on_swap=on_model_reload,
+    interval=float(os.environ.get("MODEL_WATCH_INTERVAL", 5))
+)
+try:
+    registry.reload("startup")
+except Exception as e:
+    print(f"❌ Error loading model or data: {e}")
+    raise
+
+def current_bundle():
+    """The active ModelBundle; take it once per request and use it throughout"""
+    return registry.current
+
+def __getattr__(name):
+    # food_service.catalog, .model, .batcher, ... always refer to the active bundle
+    if name in ("model", "label_encoder_y", "feature_cols", "encoder", "catalog", "risk_table", "batcher"):
+        return getattr(registry.current, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Module-level shortcuts, each using whichever bundle is active when called
+def encode_records(records):
+    return registry.current.encode_records(records)
+
+def score_matrix(matrix, resolved=None):
+    return registry.current.score_matrix(matrix, resolved)
+
+def score_matrix_batched(matrix, resolved=None):
+    return registry.current.score_matrix_batched(matrix, resolved)
+
+def score_matrix_cached(matrix, resolved=None):
+    return registry.current.score_matrix_cached(matrix, resolved)
+
+def score_records(records):
+    return registry.current.score_records(records)
+
+def score_catalog_row(pos):
+    return registry.current.score_catalog_row(pos)
+
+def search_foods(query, prefix=False, limit=10):
+    return registry.current.search_foods(query, prefix, limit)
+
+def analyze_food(food_name=None, nutritional_data=None):
+    return registry.current.analyze_food(food_name, nutritional_data)
@@ -0,0 +1,242 @@
+import os
+import csv
+import json
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.metrics import accuracy_score, log_loss
+from xgboost import XGBClassifier
+from train_model import BASE_PARAMS, load_user_data, load_food_data, train_user_model, train_food_model
+
+DATASETS = {
+    "food": (load_food_data, train_food_model),
+    "user": (load_user_data, train_user_model),
+}
+
+# Grid mode tries every combination; random mode samples SEARCH_SPACE
+PARAM_GRID = {
+    "max_depth": [4, 6, 8],
+    "learning_rate": [0.05, 0.1],
+    "subsample": [0.8, 1.0],
+    "colsample_bytree": [0.8, 1.0],
+}
+SEARCH_SPACE = {
+    "max_depth": ("int", 3, 10),
+    "learning_rate": ("log", 0.02, 0.3),
+    "min_child_weight": ("log", 0.5, 10),
+    "subsample": ("uniform", 0.6, 1.0),
+    "colsample_bytree": ("uniform", 0.5, 1.0),
+    "reg_lambda": ("log", 0.1, 10),
+    "gamma": ("uniform", 0.0, 2.0),
+}
+
+def grid_trials(grid=PARAM_GRID):
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+def random_trials(n, space=SEARCH_SPACE, seed=42):
+    rng = np.random.default_rng(seed)
+    trials = []
+    for _ in range(n):
+        params = {}
+        for key, (kind, low, high) in space.items():
+            if kind == "int":
+                params[key] = int(rng.integers(low, high + 1))
+            elif kind == "log":
+                params[key] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+            else:
+                params[key] = float(rng.uniform(low, high))
+        trials.append(params)
+    return trials
+
+# Set once per worker process by _init_worker, so the data is not re-read or re-sent per trial
+_X = None
+_y = None
+_folds = None
+_fit_args = None
+
+def _init_worker(X, y, folds, fit_args):
+    global _X, _y, _folds, _fit_args
+    _X, _y, _folds, _fit_args = X, y, folds, fit_args
+
+def _fit_fold(trial, params, fold):
+    """Train on one fold (early stopping on a slice of its training rows) and score the held-out rows"""
+    train_idx, test_idx = _folds[fold]
+    n_classes = int(_y.max()) + 1
+    try:
+        fit_idx, valid_idx = train_test_split(
+            train_idx, test_size=_fit_args["valid_fraction"], random_state=fold, stratify=_y[train_idx]
+        )
+    except ValueError:
+        # A class too rare to stratify; fall back to a plain split
+        fit_idx, valid_idx = train_test_split(train_idx, test_size=_fit_args["valid_fraction"], random_state=fold)
+
+    started = time.perf_counter()
+    model = XGBClassifier(**{
+        **{key: value for key, value in BASE_PARAMS.items() if key != "use_label_encoder"},
+        **params,
+        "n_estimators": _fit_args["max_rounds"],
+        "early_stopping_rounds": _fit_args["early_stopping_rounds"],
+        "tree_method": "hist",
+        "n_jobs": _fit_args["threads"],
+    })
+    model.fit(_X[fit_idx], _y[fit_idx], eval_set=[(_X[valid_idx], _y[valid_idx])], verbose=False)
+    probabilities = model.predict_proba(_X[test_idx])
+    return {
+        "trial": trial,
+        "fold": fold,
+        "logloss": float(log_loss(_y[test_idx], probabilities, labels=list(range(n_classes)))),
+        "accuracy": float(accuracy_score(_y[test_idx], probabilities.argmax(axis=1))),
+        "best_iteration": int(model.best_iteration),
+        "seconds": time.perf_counter() - started
+    }
+
+def summarize(trial, params, folds):
+    logloss = [f["logloss"] for f in folds]
+    return {
+        "trial": trial,
+        "mean_logloss": float(np.mean(logloss)),
+        "std_logloss": float(np.std(logloss)),
+        "mean_accuracy": float(np.mean([f["accuracy"] for f in folds])),
+        "best_iteration": int(round(np.mean([f["best_iteration"] for f in folds]))),
+        "fit_seconds": float(sum(f["seconds"] for f in folds)),
+        "params": params,
+        "status": "ok"
+    }
+
+def failed_trial(trial, params, error):
+    """Leaderboard row for a trial with a fold that raised; it ranks after every finished trial"""
+    return {
+        "trial": trial,
+        "mean_logloss": float("inf"),
+        "std_logloss": float("nan"),
+        "mean_accuracy": float("nan"),
+        "best_iteration": None,
+        "fit_seconds": float("nan"),
+        "params": params,
+        "status": f"failed: {error}"
+    }
+
+def write_leaderboard(rows, path):
+    """Rewrite the leaderboard CSV, best mean log loss first"""
+    rows = sorted(rows, key=lambda row: row["mean_logloss"])
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["rank", "trial", "mean_logloss", "std_logloss", "mean_accuracy",
+                         "best_iteration", "fit_seconds", "params", "status"])
+        for rank, row in enumerate(rows, 1):
+            writer.writerow([rank, row["trial"], f"{row['mean_logloss']:.5f}", f"{row['std_logloss']:.5f}",
+                             f"{row['mean_accuracy']:.4f}", row["best_iteration"], f"{row['fit_seconds']:.1f}",
+                             json.dumps(row["params"], sort_keys=True), row["status"]])
+    os.replace(tmp_path, path)
+    return rows
+
+def search(X, y, trials, folds=5, workers=None, threads=1, max_rounds=1000, early_stopping_rounds=30,
+           valid_fraction=0.15, time_budget=None, leaderboard_path=None, seed=42):
+    """Cross-validate every trial's params across a process pool; returns the leaderboard rows.
+
+    Each (trial, fold) pair is one task. A fold that raises marks its trial
+    as failed (listed last, with the error) and the search carries on. With
+    time_budget (seconds), tasks not yet started when it runs out are
+    cancelled and unfinished trials are left off the leaderboard.
+    """
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    y = np.asarray(y)
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    fold_indices = list(splitter.split(X, y))
+    fit_args = {
+        "threads": threads,
+        "max_rounds": max_rounds,
+        "early_stopping_rounds": early_stopping_rounds,
+        "valid_fraction": valid_fraction
+    }
+    workers = workers or max(1, (os.cpu_count() or 1) // threads)
+    deadline = time.monotonic() + time_budget if time_budget else None
+
+    done = {}
+    failed = set()
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(X, y, fold_indices, fit_args)) as pool:
+        # Trial-major order, so early trials finish (and reach the leaderboard) first
+        futures = {pool.submit(_fit_fold, trial, params, fold): (trial, fold)
+                   for trial, params in enumerate(trials) for fold in range(folds)}
+        try:
+            for future in as_completed(futures, timeout=(deadline - time.monotonic()) if deadline else None):
+                trial, fold = futures[future]
+                if trial in failed:
+                    continue
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed.add(trial)
+                    error = (str(e).splitlines() or [""])[0]
+                    rows.append(failed_trial(trial, trials[trial], f"fold {fold}: {type(e).__name__}: {error}"))
+                    print(f"   trial {trial:>3}: ❌ fold {fold} failed: {error}")
+                    if leaderboard_path:
+                        write_leaderboard(rows, leaderboard_path)
+                    continue
+                done.setdefault(result["trial"], []).append(result)
+                if len(done[result["trial"]]) == folds:
+                    row = summarize(result["trial"], trials[result["trial"]], done[result["trial"]])
+                    rows.append(row)
+                    print(f"   trial {row['trial']:>3}: logloss {row['mean_logloss']:.4f} ± {row['std_logloss']:.4f}, "
+                          f"accuracy {row['mean_accuracy']:.3f}, {row['best_iteration']} rounds")
+                    if leaderboard_path:
+                        write_leaderboard(rows, leaderboard_path)
+        except TimeoutError:
+            print(f"⏰ Time budget reached with {len(rows)}/{len(trials)} trials finished")
+            pool.shutdown(wait=True, cancel_futures=True)
+    return sorted(rows, key=lambda row: row["mean_logloss"])
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel k-fold hyperparameter search for the XGBoost models")
+    parser.add_argument("model", choices=list(DATASETS))
+    parser.add_argument("--mode", choices=["grid", "random"], default="random")
+    parser.add_argument("--trials", type=int, default=60, help="Random-mode trials")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: CPUs / threads)")
+    parser.add_argument("--threads", type=int, default=1, help="XGBoost threads per fit")
+    parser.add_argument("--max-rounds", type=int, default=1000)
+    parser.add_argument("--early-stopping", type=int, default=30, help="Rounds without improvement before stopping")
+    parser.add_argument("--time-budget", type=float, default=None, help="Minutes before unstarted folds are cancelled")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--refit", action="store_true", help="Retrain and save the model with the best params")
+    args = parser.parse_args()
+
+    load_data, train = DATASETS[args.model]
+    X, y = load_data()[:2]
+    trials = grid_trials() if args.mode == "grid" else random_trials(args.trials, seed=args.seed)
+    leaderboard_path = f"models/{args.model}_leaderboard.csv"
+    print(f"🔎 {len(trials)} {args.mode} trials x {args.folds} folds on {len(X)} rows "
+          f"({args.workers or max(1, (os.cpu_count() or 1) // args.threads)} workers x {args.threads} threads)")
+
+    started = time.perf_counter()
+    rows = search(
+        X, y, trials, folds=args.folds, workers=args.workers, threads=args.threads,
+        max_rounds=args.max_rounds, early_stopping_rounds=args.early_stopping,
+        time_budget=args.time_budget * 60 if args.time_budget else None,
+        leaderboard_path=leaderboard_path, seed=args.seed
+    )
+    completed = [row for row in rows if row["status"] == "ok"]
+    print(f"\n✅ {len(completed)} trials in {time.perf_counter() - started:.1f}s"
+          + (f", {len(rows) - len(completed)} failed" if len(rows) > len(completed) else ""))
+    if rows:
+        print(f"💾 Leaderboard saved to {leaderboard_path}")
+    if not completed:
+        return
+    best = completed[0]
+    best_params = {**best["params"], "n_estimators": best["best_iteration"] + 1, "tree_method": "hist"}
+    with open(f"models/{args.model}_best_params.json", "w") as f:
+        json.dump({**best, "params": best_params}, f, indent=2)
+    print(f"🏆 Best: logloss {best['mean_logloss']:.4f}, accuracy {best['mean_accuracy']:.3f}, params {best_params}")
+    if args.refit:
+        train(best_params)
+
+if __name__ == "__main__":
+    main()
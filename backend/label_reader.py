@@ -1,26 +1,431 @@
-import cv2
-import pytesseract
 import numpy as np
-from PIL import Image
 import re
 import json
+import os
+import sys
+import time
+import argparse
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from ocr_cache import OCRCache
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp')
+
+# Nutrient keywords per language, as (keyword regex, literal first word). The
+# English entries are the original patterns; other languages accept comma
+# decimals too. Every regex must start with its literal first word.
+EN_NUMBER = r'(\d+(?:\.\d+)?)'
+INTL_NUMBER = r'(\d+(?:[.,]\d+)?)'
+NUTRIENT_KEYWORDS = {
+    'calories': {'en': [(r'calories?', 'calorie')],
+                 'es': [(r'calorías', 'calorías'), (r'calorias', 'calorias')], 'de': [(r'kalorien', 'kalorien')]},
+    'energy': {'en': [(r'energy', 'energy')], 'es': [(r'energía', 'energía'), (r'energia', 'energia')],
+               'fr': [(r'énergie', 'énergie')], 'de': [(r'energie', 'energie')]},
+    'protein': {'en': [(r'protein', 'protein')], 'es': [(r'proteínas?', 'proteína')],
+                'fr': [(r'protéines?', 'protéine')], 'de': [(r'eiweiß', 'eiweiß'), (r'eiweiss', 'eiweiss')],
+                'it': [(r'proteine', 'proteine')]},
+    'carbohydrates': {'en': [(r'carbohydrates?', 'carbohydrate')],
+                      'es': [(r'hidratos\s*de\s*carbono', 'hidratos'), (r'carbohidratos', 'carbohidratos')],
+                      'fr': [(r'glucides', 'glucides')], 'de': [(r'kohlenhydrate', 'kohlenhydrate')],
+                      'it': [(r'carboidrati', 'carboidrati')]},
+    'carbs': {'en': [(r'carbs?', 'carb')]},
+    'fat': {'en': [(r'total\s*fat', 'total')], 'es': [(r'grasas\s*totales', 'grasas'), (r'grasas', 'grasas')],
+            'fr': [(r'matières\s*grasses', 'matières'), (r'lipides', 'lipides')],
+            'de': [(r'fett', 'fett')], 'it': [(r'grassi', 'grassi')]},
+    'saturated_fat': {'en': [(r'saturated\s*fat', 'saturated')], 'es': [(r'grasas\s*saturadas', 'grasas')],
+                      'fr': [(r'acides\s*gras\s*saturés', 'acides')],
+                      'de': [(r'gesättigte\s*fettsäuren', 'gesättigte')], 'it': [(r'grassi\s*saturi', 'grassi')]},
+    'sugar': {'en': [(r'sugars?', 'sugar')], 'es': [(r'azúcares', 'azúcares'), (r'azucares', 'azucares')],
+              'fr': [(r'sucres', 'sucres')], 'de': [(r'zucker', 'zucker')], 'it': [(r'zuccheri', 'zuccheri')]},
+    'sodium': {'en': [(r'sodium', 'sodium')], 'es': [(r'sodio', 'sodio')], 'de': [(r'natrium', 'natrium')]},
+    'fiber': {'en': [(r'dietary\s*fiber', 'dietary')],
+              'es': [(r'fibra\s*alimentaria', 'fibra'), (r'fibra', 'fibra')],
+              'fr': [(r'fibres\s*alimentaires', 'fibres'), (r'fibres', 'fibres')],
+              'de': [(r'ballaststoffe', 'ballaststoffe')], 'it': [(r'fibre', 'fibre')]},
+}
+NUTRIENT_ORDER = ('calories', 'protein', 'carbohydrates', 'carbs', 'fat', 'saturated_fat', 'sugar',
+                  'sodium', 'fiber', 'serving_size', 'servings_per_container')
+KJ_PER_KCAL = 4.184
+
+CATEGORY_KEYWORDS = {
+    'Whole Food': ['organic', 'natural', 'fresh', 'whole grain', 'unprocessed'],
+    'Whole Grain': ['whole wheat', 'brown rice', 'quinoa', 'oats', 'whole grain'],
+    'Lean Protein': ['chicken breast', 'fish', 'salmon', 'turkey', 'lean beef'],
+    'Dairy': ['milk', 'cheese', 'yogurt', 'butter', 'cream'],
+    'Fast Food': ['fried', 'burger', 'pizza', 'fries', 'fast food'],
+    'Prepared Meal': ['frozen', 'microwave', 'ready to eat', 'prepared'],
+    'Mixed': []  # Default category
+}
+HIGH_PROCESSING_KEYWORDS = ['artificial', 'preservatives', 'additives', 'hydrogenated',
+                            'high fructose', 'corn syrup', 'modified', 'processed']
+LOW_PROCESSING_KEYWORDS = ['organic', 'natural', 'fresh', 'whole', 'unprocessed']
+
+def _build_label_scanner():
+    """Index every nutrient pattern and keyword by its literal first word (its stem).
+
+    Any match of a pattern or keyword starts with its stem, and a stem holds
+    no whitespace, so it always lies inside one whitespace-separated token.
+    Finding the stems in the distinct tokens of a text therefore finds every
+    candidate position; only candidates are checked with the anchored
+    nutrient regex or startswith.
+    """
+    nutrient_rules = []
+    stems = {}
+
+    def add_nutrient(regex, stem, key, kind, priority):
+        stems.setdefault(stem, []).append(('nutrient', len(nutrient_rules)))
+        nutrient_rules.append((re.compile(regex), key, kind, priority))
+
+    for key, languages in NUTRIENT_KEYWORDS.items():
+        for lang, keywords in languages.items():
+            number = EN_NUMBER if lang == 'en' else INTL_NUMBER
+            for keyword, stem in keywords:
+                if key == 'calories':
+                    add_nutrient(rf'{keyword}\s*:?\s*(\d+)', stem, 'calories', 'count', 0)
+                elif key == 'energy':
+                    add_nutrient(rf'{keyword}\s*:?\s*{number}\s*(kcal|kj)', stem, 'calories', 'energy', 1)
+                elif key == 'sodium':
+                    add_nutrient(rf'{keyword}\s*:?\s*{number}\s*(mg|g)', stem, 'sodium', 'mg', 0)
+                else:
+                    add_nutrient(rf'{keyword}\s*:?\s*{number}\s*(mg|g)', stem, key, 'g', 0)
+    add_nutrient(r'serving\s*size\s*:?\s*([^\n]+)', 'serving', 'serving_size', 'text', 0)
+    add_nutrient(r'servings?\s*per\s*container\s*:?\s*(\d+(?:\.\d+)?)', 'serving', 'servings_per_container', 'count', 0)
+
+    keywords = set(HIGH_PROCESSING_KEYWORDS + LOW_PROCESSING_KEYWORDS)
+    for category_keywords in CATEGORY_KEYWORDS.values():
+        keywords.update(category_keywords)
+    for keyword in sorted(keywords):
+        stems.setdefault(keyword.split(' ')[0], []).append(('keyword', keyword))
+    return nutrient_rules, stems
+
+NUTRIENT_RULES, STEM_ACTIONS = _build_label_scanner()
+STEMS_BY_PREFIX = {}
+for _stem in STEM_ACTIONS:
+    STEMS_BY_PREFIX.setdefault(_stem[:2], []).append(_stem)
+_token_stems = {}
+
+def _stems_in_token(token):
+    """Stems occurring in a token, memoized per distinct token.
+
+    Looks up candidates by the two characters at each offset, so the cost
+    depends on the token length, not on how many keywords there are.
+    """
+    found = _token_stems.get(token)
+    if found is None:
+        found = frozenset(
+            stem
+            for i in range(len(token) - 1)
+            for stem in STEMS_BY_PREFIX.get(token[i:i + 2], ())
+            if token.startswith(stem, i)
+        )
+        if len(_token_stems) > 100000:
+            _token_stems.clear()
+        _token_stems[token] = found
+    return found
+
+def _to_number(value):
+    return float(value.replace(',', '.'))
+
+def _nutrient_value(kind, raw, unit):
+    """Convert a matched value: sodium to mg, energy to kcal, other nutrients to g"""
+    if kind == 'text':
+        return raw.strip()
+    value = _to_number(raw)
+    if kind == 'energy' and unit == 'kj':
+        return value / KJ_PER_KCAL
+    if kind == 'mg' and unit == 'g':
+        return value * 1000
+    if kind == 'g' and unit == 'mg':
+        return value / 1000
+    return value
+
+def scan_label_text(text):
+    """Single pass over lowercased label text.
+
+    Returns (nutrients, keywords): the first match of each nutrient pattern,
+    exactly as a separate re.search per pattern would find it, and the set of
+    category/processing keywords contained in the text.
+    """
+    stems = set()
+    lookup = _token_stems.get
+    for token in set(text.split()):
+        found = lookup(token)
+        if found is None:
+            found = _stems_in_token(token)
+        if found:
+            stems |= found
+
+    candidates = []
+    for stem in stems:
+        pos = text.find(stem)
+        while pos != -1:
+            candidates.append((pos, stem))
+            pos = text.find(stem, pos + 1)
+    candidates.sort()
+
+    first_match = {}
+    keywords = set()
+    for pos, stem in candidates:
+        for action, target in STEM_ACTIONS[stem]:
+            if action == 'keyword':
+                if target not in keywords and text.startswith(target, pos):
+                    keywords.add(target)
+            elif target not in first_match:
+                match = NUTRIENT_RULES[target][0].match(text, pos)
+                if match is not None:
+                    first_match[target] = match
+
+    found = {}
+    for index, match in first_match.items():
+        _, key, kind, priority = NUTRIENT_RULES[index]
+        current = found.get(key)
+        if current is not None and (current[0], current[1]) <= (priority, match.start()):
+            continue
+        unit = match.group(2) if match.re.groups > 1 else None
+        found[key] = (priority, match.start(), _nutrient_value(kind, match.group(1), unit))
+    nutrients = {key: found[key][2] for key in NUTRIENT_ORDER if key in found}
+    return nutrients, keywords
+
+class PytesseractBackend:
+    """OCR through the tesseract CLI; starts one tesseract process per image"""
+    
+    name = 'pytesseract'
+    
+    def image_to_string(self, image, config):
+        import pytesseract
+        return pytesseract.image_to_string(image, config=config)
+
+class TesserocrBackend:
+    """OCR through tesserocr's C-API binding with a pool of initialized engines.
+
+    Each engine loads the language model once and is reused for every
+    image; up to `workers` threads can recognise at the same time, since
+    tesserocr releases the GIL while it works.
+    """
+    
+    name = 'tesserocr'
+    
+    def __init__(self, workers=None, lang='eng'):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self.lang = lang
+        self.workers = workers or os.cpu_count() or 1
+        self._engines = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+    
+    def _parse_config(self, config):
+        """Map the tesseract CLI flags used in ocr_config onto tesserocr options"""
+        options = {'psm': None, 'oem': None}
+        parts = config.split()
+        for flag, value in zip(parts, parts[1:]):
+            if flag == '--psm':
+                options['psm'] = int(value)
+            elif flag == '--oem':
+                options['oem'] = int(value)
+        return options
+    
+    def _acquire(self, options):
+        try:
+            return self._engines.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.workers
+            if create:
+                self._created += 1
+        if not create:
+            return self._engines.get()
+        kwargs = {'lang': self.lang}
+        if options['oem'] is not None:
+            kwargs['oem'] = self._tesserocr.OEM(options['oem'])
+        try:
+            return self._tesserocr.PyTessBaseAPI(**kwargs)
+        except Exception:
+            # Give the slot back so a failed start does not shrink the pool for good
+            with self._lock:
+                self._created -= 1
+            raise
+    
+    def image_to_string(self, image, config):
+        from PIL import Image
+        options = self._parse_config(config)
+        engine = self._acquire(options)
+        try:
+            if options['psm'] is not None:
+                engine.SetPageSegMode(self._tesserocr.PSM(options['psm']))
+            engine.SetImage(Image.fromarray(image))
+            return engine.GetUTF8Text()
+        finally:
+            self._engines.put(engine)
+
+_ocr_backends = {}
+
+def get_ocr_backend(name='auto', workers=None):
+    """Shared OCR backend for this process: tesserocr when installed, otherwise pytesseract"""
+    key = (name, workers)
+    if key not in _ocr_backends:
+        backend = None
+        if name in ('auto', 'tesserocr'):
+            try:
+                backend = TesserocrBackend(workers=workers)
+            except ImportError:
+                if name == 'tesserocr':
+                    raise
+        _ocr_backends[key] = backend or PytesseractBackend()
+    return _ocr_backends[key]
 
 class FoodLabelReader:
     """OCR-based food label reader for extracting nutritional information"""
     
-    def __init__(self):
-        """Initialize the label reader"""
+    ocr_config = r'--oem 3 --psm 6'
+    
+    def __init__(self, cache=None, detect_panel=True, panel_width=1000, ocr_backend='auto'):
+        """Initialize the label reader.
+
+        cache: optional OCRCache for repeated images.
+        ocr_backend: 'auto', 'tesserocr', 'pytesseract' or a backend object.
+        detect_panel: OCR only the nutrition facts panel when one is found.
+        panel_width: width in pixels the detected panel is downscaled to
+        (about 300 DPI for a typical 3-inch-wide US panel).
+        """
         # Configure tesseract path (you may need to adjust this)
         # pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-        pass
+        self.cache = cache
+        self.detect_panel = detect_panel
+        self.panel_width = panel_width
+        self.ocr_backend = get_ocr_backend(ocr_backend) if isinstance(ocr_backend, str) else ocr_backend
+        self.last_timings = {}
+        self._scan_memo = (None, ({}, set()))
     
-    def preprocess_image(self, image_path):
-        """Preprocess image for better OCR results"""
-        # Read image
-        img = cv2.imread(image_path)
+    def _cache_config(self):
+        """Everything besides the image bytes that changes the OCR output"""
+        return f"{self.ocr_config}|panel={self.detect_panel}:{self.panel_width}|{self.ocr_backend.name}"
+    
+    def _cache_key(self, image):
+        """Hash the image content for the OCR cache.
+
+        Returns (key, image) where image may now be the bytes that were read,
+        so the file is not read a second time for decoding.
+        """
+        if isinstance(image, (str, os.PathLike)):
+            with open(image, 'rb') as f:
+                image = f.read()
+        elif hasattr(image, 'read'):
+            image = image.read()
+        if isinstance(image, np.ndarray):
+            data = np.ascontiguousarray(image)
+            header = f"{data.shape}{data.dtype}".encode()
+            return OCRCache.make_key(header + data.tobytes(), self._cache_config()), image
+        return OCRCache.make_key(image, self._cache_config()), image
+    
+    def load_image(self, image):
+        """Decode an image from a path, raw bytes, a file-like object or a NumPy array"""
+        import cv2
+        if isinstance(image, np.ndarray):
+            return image
+        if isinstance(image, (str, os.PathLike)):
+            img = cv2.imread(os.fspath(image))
+            if img is None:
+                raise ValueError(f"Could not read image: {image}")
+            return img
+        if hasattr(image, 'read'):
+            image = image.read()
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            buffer = np.frombuffer(memoryview(image), dtype=np.uint8)
+            img = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+            if img is None:
+                raise ValueError("Could not decode image bytes")
+            return img
+        raise TypeError(f"Unsupported image source: {type(image).__name__}")
+    
+    def find_nutrition_panel(self, gray, min_area_fraction=0.02, min_rules=3):
+        """Locate the nutrition facts table in a grayscale image.
+
+        The panel is recognised by its horizontal rules: long dark lines are
+        extracted with morphological opening, stacked rules (and the panel
+        border, if any) are merged into blobs, and the blob containing the
+        most rules wins. Returns (x, y, w, h) or None if no panel is found.
+        """
+        import cv2
+        # Detect on a small copy; rules survive downscaling and it keeps this stage cheap
+        scale = min(1.0, 1000 / max(gray.shape[:2]))
+        if scale < 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        h, w = gray.shape[:2]
+        binary = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 15, 10)
+        horizontal = cv2.morphologyEx(binary, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (max(10, w // 12), 1)))
+        vertical = cv2.morphologyEx(binary, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(10, h // 12))))
+        
+        rules, _ = cv2.findContours(horizontal, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if len(rules) < min_rules:
+            return None
+        rule_centers = np.array([(x + rw / 2, y + rh / 2) for x, y, rw, rh in map(cv2.boundingRect, rules)])
+        
+        # Merge rules that sit a few text lines apart into one blob per table
+        gap = max(3, h // 20)
+        merged = cv2.dilate(horizontal | vertical, cv2.getStructuringElement(cv2.MORPH_RECT, (3, gap)))
+        blobs, _ = cv2.findContours(merged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        
+        best, best_rules = None, 0
+        for blob in blobs:
+            x, y, bw, bh = cv2.boundingRect(blob)
+            if bw * bh < min_area_fraction * w * h:
+                continue
+            inside = np.count_nonzero(
+                (rule_centers[:, 0] >= x) & (rule_centers[:, 0] <= x + bw) &
+                (rule_centers[:, 1] >= y) & (rule_centers[:, 1] <= y + bh)
+            )
+            if inside >= min_rules and inside > best_rules:
+                best, best_rules = (x, y, bw, bh), inside
+        if best is None:
+            return None
+        
+        # Undo the dilation margin and map back to full resolution
+        x, y, bw, bh = best
+        y, bh = y + gap // 2, max(1, bh - 2 * (gap // 2))
+        return tuple(int(round(v / scale)) for v in (x, y, bw, bh))
+    
+    def crop_nutrition_panel(self, gray):
+        """Crop to the nutrition panel and downscale it to panel_width; full image if none is found"""
+        import cv2
+        box = self.find_nutrition_panel(gray)
+        if box is None:
+            return gray, False
+        x, y, bw, bh = box
+        pad = max(2, bw // 50)
+        panel = gray[max(0, y - pad):y + bh + pad, max(0, x - pad):x + bw + pad]
+        if panel.shape[1] > self.panel_width:
+            scale = self.panel_width / panel.shape[1]
+            panel = cv2.resize(panel, (self.panel_width, max(1, round(panel.shape[0] * scale))), interpolation=cv2.INTER_AREA)
+        return panel, True
+    
+    def preprocess_image(self, image):
+        """Preprocess image for better OCR results; per-stage seconds go to last_timings"""
+        import cv2
+        timings = self.last_timings
+        start = time.perf_counter()
+        
+        # Read or decode image (path, bytes, file-like or array)
+        img = self.load_image(image)
         
         # Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        if img.ndim == 2:
+            gray = img
+        elif img.shape[2] == 4:
+            gray = cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY)
+        else:
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        timings["decode"] = time.perf_counter() - start
+        
+        # OCR only the nutrition facts panel when one can be found
+        if self.detect_panel:
+            start = time.perf_counter()
+            gray, timings["panel_found"] = self.crop_nutrition_panel(gray)
+            timings["panel_detection"] = time.perf_counter() - start
+        
+        start = time.perf_counter()
         
         # Apply noise reduction
         denoised = cv2.medianBlur(gray, 3)
@@ -31,88 +436,64 @@ class FoodLabelReader:
         # Morphological operations to clean up
         kernel = np.ones((1, 1), np.uint8)
         cleaned = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+        timings["preprocess"] = time.perf_counter() - start
         
         return cleaned
     
-    def extract_text_from_image(self, image_path):
-        """Extract all text from food label image"""
+    def extract_text_from_image(self, image, cache_key=None):
+        """Extract all text from food label image (path, bytes, file-like or array)"""
         try:
-            # Preprocess image
-            processed_img = self.preprocess_image(image_path)
+            self.last_timings = {}
+            if self.cache is not None:
+                if cache_key is None:
+                    cache_key, image = self._cache_key(image)
+                cached = self.cache.get_text(cache_key)
+                if cached is not None:
+                    return cached
+            
+            # Preprocess image; the array goes straight to tesseract without touching disk
+            processed_img = self.preprocess_image(image)
             
             # Use tesseract to extract text
-            custom_config = r'--oem 3 --psm 6'
-            text = pytesseract.image_to_string(processed_img, config=custom_config)
+            start = time.perf_counter()
+            text = self.ocr_backend.image_to_string(processed_img, self.ocr_config).strip()
+            self.last_timings["ocr"] = time.perf_counter() - start
             
-            return text.strip()
+            if self.cache is not None and text:
+                self.cache.put_text(cache_key, text)
+            return text
         except Exception as e:
-            print(f"Error extracting text: {e}")
+            print(f"Error extracting text: {e}", file=sys.stderr)
             return ""
     
     def parse_nutritional_info(self, text):
-        """Parse nutritional information from extracted text"""
-        nutritional_data = {}
-        
-        # Common nutritional patterns
-        patterns = {
-            'calories': r'calories?\s*:?\s*(\d+)',
-            'protein': r'protein\s*:?\s*(\d+(?:\.\d+)?)\s*g',
-            'carbohydrates': r'carbohydrates?\s*:?\s*(\d+(?:\.\d+)?)\s*g',
-            'carbs': r'carbs?\s*:?\s*(\d+(?:\.\d+)?)\s*g',
-            'fat': r'total\s*fat\s*:?\s*(\d+(?:\.\d+)?)\s*g',
-            'saturated_fat': r'saturated\s*fat\s*:?\s*(\d+(?:\.\d+)?)\s*g',
-            'sugar': r'sugars?\s*:?\s*(\d+(?:\.\d+)?)\s*g',
-            'sodium': r'sodium\s*:?\s*(\d+(?:\.\d+)?)\s*mg',
-            'fiber': r'dietary\s*fiber\s*:?\s*(\d+(?:\.\d+)?)\s*g',
-            'serving_size': r'serving\s*size\s*:?\s*([^\n]+)',
-            'servings_per_container': r'servings?\s*per\s*container\s*:?\s*(\d+(?:\.\d+)?)'
-        }
-        
-        text_lower = text.lower()
-        
-        for key, pattern in patterns.items():
-            match = re.search(pattern, text_lower)
-            if match:
-                if key in ['serving_size']:
-                    nutritional_data[key] = match.group(1).strip()
-                else:
-                    nutritional_data[key] = float(match.group(1))
-        
-        return nutritional_data
+        """Parse nutritional information from extracted text.
+
+        Sodium is reported in mg, energy in kcal (kJ converted) and other
+        nutrients in g, whatever unit the label uses.
+        """
+        return dict(self._scan(text)[0])
+    
+    def _scan(self, text):
+        """Single-pass scan, memoized so parsing, category and processing share it"""
+        if self._scan_memo[0] != text:
+            self._scan_memo = (text, scan_label_text(text.lower()))
+        return self._scan_memo[1]
     
     def detect_food_category(self, text):
         """Detect food category based on text content"""
-        text_lower = text.lower()
-        
-        categories = {
-            'Whole Food': ['organic', 'natural', 'fresh', 'whole grain', 'unprocessed'],
-            'Whole Grain': ['whole wheat', 'brown rice', 'quinoa', 'oats', 'whole grain'],
-            'Lean Protein': ['chicken breast', 'fish', 'salmon', 'turkey', 'lean beef'],
-            'Dairy': ['milk', 'cheese', 'yogurt', 'butter', 'cream'],
-            'Fast Food': ['fried', 'burger', 'pizza', 'fries', 'fast food'],
-            'Prepared Meal': ['frozen', 'microwave', 'ready to eat', 'prepared'],
-            'Mixed': []  # Default category
-        }
-        
-        for category, keywords in categories.items():
-            if any(keyword in text_lower for keyword in keywords):
+        found = self._scan(text)[1]
+        for category, keywords in CATEGORY_KEYWORDS.items():
+            if any(keyword in found for keyword in keywords):
                 return category
         
         return 'Mixed'
     
     def estimate_processing_level(self, text):
         """Estimate processing level based on ingredients and text"""
-        text_lower = text.lower()
-        
-        # High processing indicators
-        high_processing = ['artificial', 'preservatives', 'additives', 'hydrogenated', 
-                          'high fructose', 'corn syrup', 'modified', 'processed']
-        
-        # Low processing indicators
-        low_processing = ['organic', 'natural', 'fresh', 'whole', 'unprocessed']
-        
-        high_score = sum(1 for indicator in high_processing if indicator in text_lower)
-        low_score = sum(1 for indicator in low_processing if indicator in text_lower)
+        found = self._scan(text)[1]
+        high_score = sum(1 for indicator in HIGH_PROCESSING_KEYWORDS if indicator in found)
+        low_score = sum(1 for indicator in LOW_PROCESSING_KEYWORDS if indicator in found)
         
         # Calculate processing level (1-10, 1=least processed, 10=most processed)
         if low_score > high_score:
@@ -149,11 +530,19 @@ class FoodLabelReader:
         
         return max(1, min(10, score))
     
-    def read_food_label(self, image_path):
-        """Main method to read and analyze food label"""
+    def read_food_label(self, image):
+        """Main method to read and analyze food label (path, bytes, file-like or array)"""
         try:
+            self.last_timings = {}
+            cache_key = None
+            if self.cache is not None:
+                cache_key, image = self._cache_key(image)
+                cached = self.cache.get_result(cache_key)
+                if cached is not None:
+                    return {**cached, "timings": {"cache_hit": True}}
+            
             # Extract text from image
-            text = self.extract_text_from_image(image_path)
+            text = self.extract_text_from_image(image, cache_key)
             
             if not text:
                 return {"error": "No text found in image"}
@@ -173,7 +562,7 @@ class FoodLabelReader:
             # Calculate per 100g values if serving size is available
             per_100g_data = self.calculate_per_100g(nutritional_data)
             
-            return {
+            result = {
                 "extracted_text": text,
                 "nutritional_data": nutritional_data,
                 "per_100g_data": per_100g_data,
@@ -182,6 +571,9 @@ class FoodLabelReader:
                 "nutritional_density": nutritional_density,
                 "analysis_complete": True
             }
+            if self.cache is not None:
+                self.cache.put_result(cache_key, result)
+            return {**result, "timings": self.last_timings}
             
         except Exception as e:
             return {"error": f"Error reading label: {str(e)}"}
@@ -201,16 +593,120 @@ class FoodLabelReader:
         
         return per_100g
 
+    def read_food_labels(self, paths, workers=None):
+        """Read many labels across a process pool, yielding {"path", ...result} as each one completes.
+
+        A failing image yields an "error" entry and the batch carries on.
+        """
+        paths = list(paths)
+        if workers == 1:
+            for path in paths:
+                yield _read_label_task(path, self)
+            return
+
+        cache_args = (self.cache.path, self.cache.max_entries) if self.cache is not None else None
+        initargs = (cache_args, self.detect_panel, self.panel_width, self.ocr_backend.name)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            futures = {pool.submit(_read_label_task, path): path for path in paths}
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except Exception as e:
+                    yield {"path": futures[future], "error": f"Worker failed: {e}"}
+
+_worker_reader = None
+
+def _init_worker(cache_args=None, detect_panel=True, panel_width=1000, ocr_backend='auto'):
+    """Create one FoodLabelReader per worker process, sharing the parent's on-disk cache"""
+    global _worker_reader
+    cache = OCRCache(*cache_args) if cache_args else None
+    _worker_reader = FoodLabelReader(cache=cache, detect_panel=detect_panel, panel_width=panel_width,
+                                     ocr_backend=get_ocr_backend(ocr_backend, workers=1))
+
+# Model feature -> label keys (first one found wins) and the CLI's defaults for fields a label lacks
+LABEL_FEATURES = {
+    'Calories_per_100g': ('calories',),
+    'Protein_per_100g': ('protein',),
+    'Carbs_per_100g': ('carbohydrates', 'carbs'),
+    'Fat_per_100g': ('fat',),
+    'Fiber_per_100g': ('fiber',),
+    'Sugar_per_100g': ('sugar',),
+    'Sodium_per_100g': ('sodium',),
+}
+LABEL_FEATURE_DEFAULTS = {'Glycemic_Index': 50, 'Additives_Count': 0}
+
+def label_to_features(result):
+    """Turn a read_food_label result into the nutritional_data dict the food model expects"""
+    values = result.get('per_100g_data') or result.get('nutritional_data') or {}
+    features = {'Food_Category': result.get('food_category', 'Mixed')}
+    for feature, keys in LABEL_FEATURES.items():
+        features[feature] = next((float(values[key]) for key in keys if key in values), 0.0)
+    features['Processing_Level'] = result.get('processing_level', 5)
+    features['Nutritional_Density'] = result.get('nutritional_density', 5)
+    features.update(LABEL_FEATURE_DEFAULTS)
+    return features
+
+def _read_label_task(path, reader=None):
+    reader = reader or _worker_reader or FoodLabelReader()
+    try:
+        result = reader.read_food_label(path)
+    except Exception as e:
+        result = {"error": f"Error reading label: {e}"}
+    return {"path": path, **result}
+
+def expand_image_paths(paths):
+    """Expand directories into the image files they contain"""
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
 def main():
-    """Test the label reader"""
-    reader = FoodLabelReader()
-    
-    # Test with a sample image (you'll need to provide an actual image)
-    # result = reader.read_food_label("sample_food_label.jpg")
-    # print(json.dumps(result, indent=2))
-    
-    print("Food Label Reader initialized successfully!")
-    print("Ready to read food labels and extract nutritional information.")
+    """Read food labels from the command line, streaming JSONL results"""
+    parser = argparse.ArgumentParser(description="Extract nutritional information from food label images")
+    parser.add_argument("paths", nargs="*", help="Label images or directories of images")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="Worker processes (default: CPU count)")
+    parser.add_argument("-o", "--output", help="Write JSONL results to this file instead of stdout")
+    parser.add_argument("--cache", help="SQLite OCR cache file reused across runs (e.g. cache/ocr_cache.sqlite)")
+    parser.add_argument("--cache-size", type=int, default=10000, help="Maximum cached images (LRU eviction)")
+    parser.add_argument("--full-image", action="store_true", help="OCR the whole image instead of the detected nutrition panel")
+    parser.add_argument("--panel-width", type=int, default=1000, help="Width in pixels the detected panel is downscaled to")
+    parser.add_argument("--ocr-backend", choices=["auto", "tesserocr", "pytesseract"], default="auto",
+                        help="tesserocr keeps engines loaded between images; pytesseract runs the tesseract CLI")
+    args = parser.parse_args()
+
+    if not args.paths:
+        print("Food Label Reader initialized successfully!")
+        print("Ready to read food labels and extract nutritional information.")
+        print("Usage: python label_reader.py IMAGE_OR_DIR [...] [--workers N] [--output results.jsonl]")
+        return
+
+    paths = list(expand_image_paths(args.paths))
+    reader = FoodLabelReader(
+        cache=OCRCache(args.cache, args.cache_size) if args.cache else None,
+        detect_panel=not args.full_image,
+        panel_width=args.panel_width,
+        ocr_backend=args.ocr_backend
+    )
+    out = open(args.output, "w") if args.output else sys.stdout
+    done = failed = 0
+    start = time.perf_counter()
+    try:
+        for result in reader.read_food_labels(paths, workers=args.workers):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            done += 1
+            failed += "error" in result
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(f"📊 {done} labels ({failed} failed) in {elapsed:.1f}s — {rate:.1f} labels/s with {args.workers} workers", file=sys.stderr)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,112 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+
+class MicroBatcher:
+    """Coalesces concurrent small predictions into one vectorized model call.
+
+    submit() hands a block of feature rows to a background thread and waits.
+    The thread takes the first waiting block, keeps collecting until `window`
+    seconds have passed or `max_batch` rows are gathered, runs predict() once
+    on the stacked rows and hands every caller back its own slice.
+    """
+
+    def __init__(self, predict, window=0.002, max_batch=64):
+        self.predict = predict
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.closed = False
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+        self.wait_time = 0.0
+        self.predict_time = 0.0
+
+    def submit(self, rows):
+        """Predict a (k, features) block through the shared batch; returns k results"""
+        future = Future()
+        with self._lock:
+            closed = self.closed
+            if not closed:
+                # Started on first use, so a pre-fork parent never owns the thread
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                    self._thread.start()
+                self._pending.put((rows, future, time.perf_counter()))
+        if closed:
+            # Retired batcher (its model was swapped out): predict directly
+            return self.predict(rows)
+        return future.result()
+
+    def close(self):
+        """Finish the blocks already queued, then stop the thread"""
+        with self._lock:
+            self.closed = True
+            if self._thread is not None:
+                self._pending.put(None)
+
+    def _collect(self):
+        first = self._pending.get()
+        if first is None:
+            return [], 0
+        items = [first]
+        size = len(first[0])
+        deadline = time.perf_counter() + self.window
+        while size < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._pending.get(timeout=remaining) if remaining > 0 else self._pending.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # close() sentinel: run what was gathered, then stop
+                self._pending.put(None)
+                break
+            items.append(item)
+            size += len(item[0])
+        return items, size
+
+    def _run(self):
+        while True:
+            items, size = self._collect()
+            if not items:
+                return
+            started = time.perf_counter()
+            try:
+                results = self.predict(np.vstack([rows for rows, _, _ in items]))
+            except Exception as e:
+                for _, future, _ in items:
+                    future.set_exception(e)
+                results = None
+            finished = time.perf_counter()
+            if results is not None:
+                start = 0
+                for rows, future, _ in items:
+                    future.set_result(results[start:start + len(rows)])
+                    start += len(rows)
+            with self._lock:
+                self.batches += 1
+                self.rows += size
+                self.largest_batch = max(self.largest_batch, size)
+                self.wait_time += sum(started - enqueued for _, _, enqueued in items)
+                self.predict_time += finished - started
+
+    def stats(self):
+        with self._lock:
+            return {
+                "window_ms": self.window * 1000,
+                "closed": self.closed,
+                "max_batch": self.max_batch,
+                "queue_depth": self._pending.qsize(),
+                "batches": self.batches,
+                "rows": self.rows,
+                "avg_batch_size": self.rows / self.batches if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+                "avg_wait_ms": self.wait_time / self.rows * 1000 if self.rows else 0.0,
+                "avg_predict_ms": self.predict_time / self.batches * 1000 if self.batches else 0.0
+            }
@@ -0,0 +1,136 @@
+import os
+import time
+import threading
+
+class ReloadInProgress(Exception):
+    """Raised when a reload is requested while another one is still loading"""
+
+class ModelRegistry:
+    """Holds the active model bundle and swaps in new versions without a restart.
+
+    reload() builds a complete bundle off to the side (load() is expected to
+    load and warm it), then replaces the single `current` reference, so
+    requests keep being served by the old version until the new one is
+    ready, and a request that already took a bundle finishes on it. watch()
+    polls the artifact files and reloads once they have stopped changing.
+    """
+
+    def __init__(self, load, paths, on_swap=None, interval=5.0, history=10):
+        self.load = load
+        self.paths = list(paths)
+        self.on_swap = on_swap
+        self.interval = interval
+        self.history = history
+        self.current = None
+        self.reloads = []
+        self.last_error = None
+        self._reload_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._loaded_stats = None
+        self._failed_stats = None
+        self._watcher_pid = None
+
+    def _stat(self):
+        """Cheap change detector: (size, mtime) of every artifact, None when missing"""
+        stats = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                stats.append((st.st_size, st.st_mtime_ns))
+            except OSError:
+                stats.append(None)
+        return tuple(stats)
+
+    def reload(self, reason="manual"):
+        """Load, warm and activate a new bundle in the calling thread; returns it.
+
+        Raises ReloadInProgress if another reload holds the lock, and re-raises
+        load errors after recording them; the current bundle stays active.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            raise ReloadInProgress("A model reload is already in progress")
+        try:
+            started = time.perf_counter()
+            try:
+                bundle = self.load()
+            except Exception as e:
+                self._failed_stats = self._stat()
+                self.last_error = {"reason": reason, "error": str(e), "at": time.time()}
+                raise
+            seconds = time.perf_counter() - started
+            # After load(): files load() itself writes (compiled trees) must not look like a new version
+            stats = self._stat()
+
+            with self._lock:
+                old, self.current = self.current, bundle
+                self._loaded_stats = stats
+                self._failed_stats = None
+                self.last_error = None
+                self.reloads.append({
+                    "version": getattr(bundle, "version", None),
+                    "previous_version": getattr(old, "version", None),
+                    "reason": reason,
+                    "load_seconds": round(seconds, 3),
+                    "at": time.time()
+                })
+                del self.reloads[:-self.history]
+            if old is not None and self.on_swap is not None:
+                self.on_swap(old, bundle)
+            return bundle
+        finally:
+            self._reload_lock.release()
+
+    def reload_async(self, reason="manual"):
+        """Start reload() in a background thread; returns False if one is already running"""
+        if self._reload_lock.locked():
+            return False
+
+        def run():
+            try:
+                bundle = self.reload(reason)
+                print(f"🔄 Model {bundle.version} is now active ({reason})")
+            except ReloadInProgress:
+                pass
+            except Exception as e:
+                print(f"❌ Model reload failed, keeping {self.current.version}: {e}")
+
+        threading.Thread(target=run, name="model-reload", daemon=True).start()
+        return True
+
+    def watch(self):
+        """Start polling the artifact files (idempotent, and restarted in forked workers)"""
+        if self.interval <= 0:
+            return
+        with self._lock:
+            # Threads do not survive fork, so a pre-fork worker starts its own watcher
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+        threading.Thread(target=self._watch, name="model-watcher", daemon=True).start()
+
+    def _watch(self):
+        pending = None
+        while True:
+            time.sleep(self.interval)
+            stats = self._stat()
+            if stats == self._loaded_stats or stats == self._failed_stats:
+                pending = None
+                continue
+            if stats != pending:
+                # Training writes several files; wait one interval for them to settle
+                pending = stats
+                continue
+            pending = None
+            self.reload_async("artifacts changed")
+
+    def status(self):
+        bundle = self.current
+        return {
+            "active_version": getattr(bundle, "version", None),
+            "loaded_at": getattr(bundle, "loaded_at", None),
+            "reloading": self._reload_lock.locked(),
+            "watching": self.interval > 0 and self._watcher_pid == os.getpid(),
+            "watch_interval": self.interval,
+            "last_error": self.last_error,
+            "reloads": list(self.reloads)
+        }
@@ -0,0 +1,147 @@
+import os
+import json
+import pickle
+import argparse
+import numpy as np
+from tree_inference import load_compiled, compile_model
+
+META_VERSION = 1
+MODEL_EXTENSION = ".ubj"
+META_EXTENSION = ".meta.json"
+
+# (pickled model, pickled target encoder, native base path, pickled feature encoders, pickled feature names)
+MODELS = {
+    "food": ("models/food_analysis_model.pkl", "models/food_label_encoder_y.pkl", "models/food_analysis_model",
+             "models/food_feature_encoders.pkl", "models/food_feature_names.pkl"),
+    "user": ("models/xgboost_model.pkl", "models/label_encoder_y.pkl", "models/xgboost_model", None, None),
+}
+
+class LabelDecoder:
+    """The part of a fitted LabelEncoder that serving needs: class index -> label"""
+
+    def __init__(self, classes):
+        self.classes_ = np.array(list(classes), dtype=object)
+
+    def inverse_transform(self, indices):
+        return self.classes_[np.asarray(indices, dtype=np.intp)]
+
+class BoosterModel:
+    """predict_proba straight from an xgboost.Booster, without the sklearn wrapper"""
+
+    def __init__(self, booster, feature_names=None):
+        self.booster = booster
+        self.feature_names = list(feature_names or booster.feature_names or [])
+        # Match XGBClassifier, which predicts with the trees up to best_iteration after early stopping
+        best_iteration = booster.attr("best_iteration")
+        self.iteration_range = (0, int(best_iteration) + 1) if best_iteration is not None else (0, 0)
+
+    @classmethod
+    def load(cls, path, feature_names=None):
+        import xgboost as xgb
+        return cls(xgb.Booster(model_file=path), feature_names)
+
+    def predict_proba(self, X):
+        if hasattr(X, "columns") and self.feature_names:
+            X = X[self.feature_names]
+        values = np.asarray(X, dtype=np.float32)
+        probabilities = self.booster.inplace_predict(values, iteration_range=self.iteration_range)
+        if probabilities.ndim == 1:
+            # binary:logistic gives P(class 1) only
+            probabilities = np.column_stack([1 - probabilities, probabilities])
+        return probabilities
+
+def native_paths(base):
+    return f"{base}{MODEL_EXTENSION}", f"{base}{META_EXTENSION}"
+
+def save_native(model, label_encoder_y, base, feature_names=None, label_encoders=None):
+    """Save the booster in XGBoost's UBJSON format plus a JSON sidecar with labels and encoders"""
+    model_path, meta_path = native_paths(base)
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    os.makedirs(os.path.dirname(model_path) or ".", exist_ok=True)
+    booster.save_model(model_path)
+    meta = {
+        "version": META_VERSION,
+        "classes": [str(c) for c in label_encoder_y.classes_],
+        "feature_names": list(feature_names if feature_names is not None else booster.feature_names or []),
+        "feature_encoders": {
+            col: [str(c) for c in le.classes_] for col, le in (label_encoders or {}).items()
+        }
+    }
+    with open(meta_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    # Compile here rather than on first load, so a compiled-backend load never writes an artifact
+    try:
+        compile_model(booster, base, model_path, meta["feature_names"] or None)
+    except Exception as e:
+        print(f"⚠️  Could not compile {model_path} for NumPy inference: {e}")
+    return model_path, meta_path
+
+def load_native(base):
+    """Load a saved booster and its sidecar: (model, label decoder, meta dict)"""
+    model_path, meta_path = native_paths(base)
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("version") != META_VERSION:
+        raise ValueError(f"Unsupported model metadata version: {meta.get('version')}")
+    model = BoosterModel.load(model_path, meta["feature_names"])
+    return model, LabelDecoder(meta["classes"]), meta
+
+def load_model(pickle_path, label_encoder_path, base, model_format=None, backend=None):
+    """Load a classifier and its target encoder, preferring the native format.
+
+    model_format (or MODEL_FORMAT) is "auto" (native when saved, else the
+    pickles), "native" or "pickle". backend (or INFERENCE_BACKEND) is
+    "xgboost" or "compiled"; the compiled backend uses the flattened trees
+    save_native writes next to the model, compiling and parity-checking them
+    first if they are missing or stale (e.g. a pickle-only model). Returns (model, label_encoder_y, meta); meta is
+    None for pickles.
+    """
+    model_format = model_format or os.environ.get("MODEL_FORMAT", "auto")
+    backend = backend or os.environ.get("INFERENCE_BACKEND", "xgboost")
+    if backend not in ("xgboost", "compiled"):
+        raise ValueError(f"Unknown inference backend: {backend}")
+    use_native = model_format == "native" or (model_format == "auto" and all(map(os.path.exists, native_paths(base))))
+    source_path = native_paths(base)[0] if use_native else pickle_path
+
+    if backend == "compiled" and use_native:
+        # Fast path: NumPy arrays and JSON only, xgboost is never imported
+        compiled = load_compiled(base, source_path)
+        if compiled is not None:
+            with open(native_paths(base)[1]) as f:
+                meta = json.load(f)
+            return compiled, LabelDecoder(meta["classes"]), meta
+
+    if use_native:
+        model, label_encoder_y, meta = load_native(base)
+    else:
+        model = pickle.load(open(pickle_path, "rb"))
+        label_encoder_y = pickle.load(open(label_encoder_path, "rb"))
+        meta = None
+    if backend == "compiled":
+        booster = model.booster if isinstance(model, BoosterModel) else model.get_booster()
+        feature_names = meta["feature_names"] if meta else booster.feature_names
+        print(f"🔧 Compiling {source_path} for NumPy inference...")
+        model, _ = compile_model(booster, base, source_path, feature_names)
+    return model, label_encoder_y, meta
+
+def export_pickles(name):
+    """Convert a pickled model (and its encoders) to the native format"""
+    pickle_path, label_encoder_path, base, encoders_path, names_path = MODELS[name]
+    model = pickle.load(open(pickle_path, "rb"))
+    label_encoder_y = pickle.load(open(label_encoder_path, "rb"))
+    label_encoders = pickle.load(open(encoders_path, "rb")) if encoders_path else None
+    feature_names = pickle.load(open(names_path, "rb")) if names_path else None
+    return save_native(model, label_encoder_y, base, feature_names, label_encoders)
+
+def main():
+    parser = argparse.ArgumentParser(description="Export pickled models to XGBoost's native format")
+    parser.add_argument("models", nargs="*", help=f"Models to export: {', '.join(MODELS)} (default: all)")
+    args = parser.parse_args()
+    for name in args.models or list(MODELS):
+        if name not in MODELS:
+            parser.error(f"unknown model {name!r}")
+        model_path, meta_path = export_pickles(name)
+        print(f"💾 {name} model saved to {model_path} and {meta_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import json
+import operator
+import os
+import numpy as np
+import pandas as pd
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+# Thresholds behind FoodScanner.get_nutritional_analysis. Each concern is an
+# if/elif chain: the first matching level applies its penalty and message.
+DEFAULT_RULES = {
+    "base_score": 100,
+    "min_score": 0,
+    "concerns": [
+        {"field": "Processing_Level", "default": 0, "levels": [
+            {"op": ">", "value": 7, "penalty": 25, "message": "Highly processed food"},
+            {"op": ">", "value": 5, "penalty": 10, "message": "Moderately processed food"}
+        ]},
+        {"field": "Nutritional_Density", "default": 10, "levels": [
+            {"op": "<", "value": 5, "penalty": 15, "message": "Low nutritional density"}
+        ]},
+        {"field": "Sugar_per_100g", "default": 0, "levels": [
+            {"op": ">", "value": 15, "penalty": 15, "message": "High sugar content"},
+            {"op": ">", "value": 10, "penalty": 7, "message": "Moderate sugar content"}
+        ]},
+        {"field": "Sodium_per_100g", "default": 0, "levels": [
+            {"op": ">", "value": 400, "penalty": 15, "message": "Very high sodium content"},
+            {"op": ">", "value": 200, "penalty": 7, "message": "Moderate sodium content"}
+        ]},
+        {"field": "Fat_per_100g", "default": 0, "levels": [
+            {"op": ">", "value": 20, "penalty": 10, "message": "High fat content"}
+        ]},
+        {"field": "Fiber_per_100g", "default": 10, "levels": [
+            {"op": "<", "value": 3, "penalty": 10, "message": "Low fiber content"}
+        ]},
+        {"field": "Additives_Count", "default": 0, "levels": [
+            {"op": ">", "value": 5, "penalty": 10, "message": "Contains many additives"}
+        ]}
+    ],
+    "recommendations": [
+        {"score_below": 50, "message": "Consider healthier alternatives with less processing and additives."},
+        {"field": "Processing_Level", "default": 0, "op": ">", "value": 5, "message": "Choose less processed foods."},
+        {"field": "Sugar_per_100g", "default": 0, "op": ">", "value": 10, "message": "Reduce sugar intake."},
+        {"field": "Sodium_per_100g", "default": 0, "op": ">", "value": 200, "message": "Reduce sodium intake."}
+    ]
+}
+
+class RuleEngine:
+    """Table-driven nutritional rules evaluated over whole columns at once.
+
+    evaluate() accepts a DataFrame, a dict of columns/scalars or a NumPy
+    structured array and returns health scores plus concern and
+    recommendation bitmasks (bit i set = message i applies). analyze() gives
+    the single-item dict that get_nutritional_analysis always returned.
+    """
+
+    def __init__(self, rules=None):
+        self.rules = rules or DEFAULT_RULES
+        self.base_score = self.rules.get("base_score", 100)
+        self.min_score = self.rules.get("min_score", 0)
+        self.concern_messages = [
+            level["message"] for concern in self.rules["concerns"] for level in concern["levels"]
+        ]
+        self.recommendation_messages = [rec["message"] for rec in self.rules["recommendations"]]
+        if max(len(self.concern_messages), len(self.recommendation_messages)) > 64:
+            raise ValueError("At most 64 concern levels and 64 recommendations are supported")
+
+    @classmethod
+    def from_file(cls, path):
+        """Load thresholds from a JSON file shaped like DEFAULT_RULES"""
+        with open(path) as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def _length(data):
+        if isinstance(data, dict):
+            for value in data.values():
+                if np.ndim(value) > 0:
+                    return len(value)
+            return 1
+        return len(data)
+
+    @staticmethod
+    def _column(data, field, default, n):
+        """Values of field as a float array, using default where the field is absent"""
+        if isinstance(data, pd.DataFrame):
+            present = field in data.columns
+        elif isinstance(data, np.ndarray):
+            present = data.dtype.names is not None and field in data.dtype.names
+        else:
+            present = field in data
+        if not present:
+            return np.full(n, default, dtype=np.float64)
+        values = data[field]
+        if np.ndim(values) == 0:
+            return np.full(n, values, dtype=np.float64)
+        return np.asarray(values, dtype=np.float64)
+
+    def evaluate(self, data):
+        """Apply every rule to all rows; returns health_score, concern_mask and recommendation_mask arrays"""
+        n = self._length(data)
+        score = np.full(n, self.base_score, dtype=np.int64)
+        concern_mask = np.zeros(n, dtype=np.uint64)
+        bit = 0
+        for concern in self.rules["concerns"]:
+            values = self._column(data, concern["field"], concern.get("default", 0), n)
+            matched = np.zeros(n, dtype=bool)
+            for level in concern["levels"]:
+                hit = OPERATORS[level["op"]](values, level["value"]) & ~matched
+                score -= np.where(hit, level["penalty"], 0)
+                concern_mask |= np.where(hit, np.uint64(1 << bit), np.uint64(0))
+                matched |= hit
+                bit += 1
+
+        recommendation_mask = np.zeros(n, dtype=np.uint64)
+        for bit, rec in enumerate(self.rules["recommendations"]):
+            if "score_below" in rec:
+                hit = score < rec["score_below"]
+            else:
+                values = self._column(data, rec["field"], rec.get("default", 0), n)
+                hit = OPERATORS[rec["op"]](values, rec["value"])
+            recommendation_mask |= np.where(hit, np.uint64(1 << bit), np.uint64(0))
+
+        return {
+            "health_score": np.maximum(score, self.min_score),
+            "concern_mask": concern_mask,
+            "recommendation_mask": recommendation_mask
+        }
+
+    @staticmethod
+    def _decode(mask, messages):
+        mask = int(mask)
+        return [message for bit, message in enumerate(messages) if mask >> bit & 1]
+
+    def concerns(self, masks):
+        """Decode concern bitmasks into message lists (decoding each distinct mask once)"""
+        return self._decode_all(masks, self.concern_messages)
+
+    def recommendations(self, masks):
+        """Decode recommendation bitmasks into message lists"""
+        return self._decode_all(masks, self.recommendation_messages)
+
+    def _decode_all(self, masks, messages):
+        unique, inverse = np.unique(masks, return_inverse=True)
+        decoded = [self._decode(mask, messages) for mask in unique]
+        return [decoded[i] for i in inverse.ravel()]
+
+    def analyze(self, nutritional_data):
+        """Single-item analysis, identical to the original per-dict rules"""
+        result = self.evaluate(nutritional_data)
+        return {
+            "health_score": int(result["health_score"][0]),
+            "concerns": self._decode(result["concern_mask"][0], self.concern_messages),
+            "recommendations": self._decode(result["recommendation_mask"][0], self.recommendation_messages)
+        }
+
+_default_engine = None
+
+def default_engine():
+    """Engine for DEFAULT_RULES, or for the JSON file named by NUTRITION_RULES_PATH"""
+    global _default_engine
+    if _default_engine is None:
+        path = os.environ.get("NUTRITION_RULES_PATH")
+        _default_engine = RuleEngine.from_file(path) if path else RuleEngine()
+    return _default_engine
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+DEFAULT_CACHE_PATH = "cache/ocr_cache.sqlite"
+
+class OCRCache:
+    """Persistent OCR cache keyed by a hash of the image bytes plus the OCR config.
+
+    Entries live in a SQLite database in WAL mode, so several worker
+    processes can read and write it concurrently. Each entry holds the
+    extracted text and, once available, the parsed read_food_label result.
+    The cache is capped at max_entries with least-recently-used eviction.
+    Triggers keep a row count, so a write only evicts when it goes over.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ocr_cache ("
+                " key TEXT PRIMARY KEY,"
+                " text TEXT,"
+                " result TEXT,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ocr_cache_last_access ON ocr_cache (last_access)")
+        with closing(self._connect()) as conn, conn:
+            # One transaction, so concurrent processes cannot both seed the count
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("CREATE TABLE IF NOT EXISTS ocr_cache_size (entries INTEGER NOT NULL)")
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS ocr_cache_insert AFTER INSERT ON ocr_cache"
+                " BEGIN UPDATE ocr_cache_size SET entries = entries + 1; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS ocr_cache_delete AFTER DELETE ON ocr_cache"
+                " BEGIN UPDATE ocr_cache_size SET entries = entries - 1; END"
+            )
+            conn.execute(
+                "INSERT INTO ocr_cache_size (entries) SELECT COUNT(*) FROM ocr_cache"
+                " WHERE NOT EXISTS (SELECT 1 FROM ocr_cache_size)"
+            )
+
+    def _connect(self):
+        # A short-lived connection per call keeps the cache safe across forks and threads
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def make_key(image_bytes, config):
+        digest = hashlib.sha256()
+        digest.update(memoryview(image_bytes))
+        digest.update(b"\0")
+        digest.update(config.encode())
+        return digest.hexdigest()
+
+    def _get(self, key, column):
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(f"SELECT {column} FROM ocr_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or row[0] is None:
+                return None
+            conn.execute("UPDATE ocr_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def _put(self, key, column, value):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                f"INSERT INTO ocr_cache (key, {column}, last_access) VALUES (?, ?, ?)"
+                f" ON CONFLICT(key) DO UPDATE SET {column} = excluded.{column}, last_access = excluded.last_access",
+                (key, value, time.time())
+            )
+            over = conn.execute("SELECT entries FROM ocr_cache_size").fetchone()[0] - self.max_entries
+            if over > 0:
+                conn.execute(
+                    "DELETE FROM ocr_cache WHERE key IN ("
+                    " SELECT key FROM ocr_cache ORDER BY last_access LIMIT ?)",
+                    (over,)
+                )
+
+    def get_text(self, key):
+        return self._get(key, "text")
+
+    def put_text(self, key, text):
+        self._put(key, "text", text)
+
+    def get_result(self, key):
+        value = self._get(key, "result")
+        return json.loads(value) if value is not None else None
+
+    def put_result(self, key, result):
+        self._put(key, "result", json.dumps(result))
+
+    def __len__(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT entries FROM ocr_cache_size").fetchone()[0]
+
+    def clear(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM ocr_cache")
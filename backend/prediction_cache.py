@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import OrderedDict
+
+class PredictionCache:
+    """Bounded LRU cache (with optional TTL) for model predictions.
+
+    Keys are canonicalized feature vectors: values rounded to `precision`
+    decimals, so the same label scanned again maps to the same entry.
+    """
+
+    def __init__(self, maxsize=4096, ttl=None, precision=3):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.precision = precision
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, values, columns=None):
+        """Canonical key for a feature vector; pass columns when their order is not fixed"""
+        rounded = []
+        for value in values:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                rounded.append(str(value))
+                continue
+            rounded.append(None if value != value else round(value, self.precision))
+        if columns is not None:
+            return tuple(sorted(zip(map(str, columns), rounded)))
+        return tuple(rounded)
+
+    def get(self, key):
+        """Return the cached value or None, updating recency and counters"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry; call this whenever the model is reloaded"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,158 @@
+import gc
+import os
+import sys
+import time
+import signal
+import socket
+import argparse
+
+def load_app(kind):
+    """Import the API once in the parent; the catalog is moved into NumPy arrays"""
+    if kind == "asgi":
+        import food_scanner_asgi as module
+    else:
+        import food_scanner_api as module
+    import food_service
+    food_service.current_bundle().catalog.compact()
+    return module.app
+
+def memory_usage(pid):
+    """RSS, PSS and shared/private kB for a process, from /proc"""
+    usage = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"):
+                    usage[key] = int(value.split()[0])
+    except OSError:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        usage["Rss"] = int(line.split()[1])
+        except OSError:
+            pass
+    return {
+        "rss_kb": usage.get("Rss"),
+        "pss_kb": usage.get("Pss"),
+        "shared_kb": usage["Shared_Clean"] + usage["Shared_Dirty"] if "Shared_Clean" in usage else None,
+        "private_kb": usage["Private_Clean"] + usage["Private_Dirty"] if "Private_Clean" in usage else None
+    }
+
+def report_memory(parent_pid, workers):
+    """Print RSS/PSS for the parent and every worker"""
+    def fmt(kb):
+        return f"{kb / 1024:8.1f} MB" if kb is not None else "     n/a"
+    print(f"📊 {'process':>16} {'RSS':>11} {'PSS':>11} {'shared':>11} {'private':>11}", flush=True)
+    total_pss = 0
+    for label, pid in [("parent", parent_pid)] + [(f"worker {pid}", pid) for pid in workers]:
+        usage = memory_usage(pid)
+        total_pss += usage["pss_kb"] or 0
+        print(f"   {label:>16} {fmt(usage['rss_kb'])} {fmt(usage['pss_kb'])} "
+              f"{fmt(usage['shared_kb'])} {fmt(usage['private_kb'])}", flush=True)
+    if total_pss:
+        print(f"   {'total PSS':>16} {fmt(total_pss)}", flush=True)
+
+def serve_worker(app, kind, sock, args):
+    """Run one server on the shared listening socket until terminated"""
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+    gc.enable()
+    if kind == "asgi":
+        import uvicorn
+        uvicorn.Server(uvicorn.Config(app, fd=sock.fileno(), log_level="warning")).run()
+    else:
+        from waitress import serve
+        serve(app, sockets=[sock], threads=args.threads, ident="food-scanner")
+
+def spawn_worker(app, kind, sock, args):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            serve_worker(app, kind, sock, args)
+        finally:
+            os._exit(0)
+    return pid
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork server: load the model once, share it across worker processes")
+    parser.add_argument("--app", choices=["wsgi", "asgi"], default="wsgi", help="Flask (wsgi) or FastAPI (asgi) app")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 5000)))
+    parser.add_argument("-w", "--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("WSGI_THREADS", 4)),
+                        help="Request threads per wsgi worker")
+    parser.add_argument("--report-interval", type=float, default=60, help="Seconds between memory reports (0 = only on SIGUSR1)")
+    args = parser.parse_args()
+
+    sock = socket.create_server((args.host, args.port), reuse_port=False, backlog=2048)
+    sock.set_inheritable(True)
+
+    # Python's own advice for fork-without-exec servers: no collections while the
+    # artifacts load (so no freed holes are left in their pages), gc.freeze() just
+    # before forking, and collection re-enabled in each worker.
+    started = time.time()
+    gc.disable()
+    app = load_app(args.app)
+    gc.collect()
+    gc.freeze()
+    print(f"✅ Loaded in {time.time() - started:.2f}s; {gc.get_freeze_count()} objects frozen", flush=True)
+
+    parent_pid = os.getpid()
+    workers = set()
+    for _ in range(args.workers):
+        workers.add(spawn_worker(app, args.app, sock, args))
+    print(f"🚀 Serving {args.app} on {args.host}:{args.port} with {len(workers)} workers", flush=True)
+
+    stopping = False
+    report_now = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    def request_report(signum, frame):
+        nonlocal report_now
+        report_now = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGUSR1, request_report)
+
+    next_report = time.time() + min(args.report_interval, 5) if args.report_interval else None
+    while not stopping:
+        # Replace any worker that died
+        try:
+            while True:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+                if pid == 0:
+                    break
+                if pid in workers:
+                    workers.discard(pid)
+                    print(f"⚠️  Worker {pid} exited ({status}); restarting", file=sys.stderr, flush=True)
+                    workers.add(spawn_worker(app, args.app, sock, args))
+        except ChildProcessError:
+            pass
+        if report_now or (next_report is not None and time.time() >= next_report):
+            report_memory(parent_pid, sorted(workers))
+            report_now = False
+            if next_report is not None:
+                next_report = time.time() + args.report_interval
+        time.sleep(0.5)
+
+    print("🛑 Stopping workers...", flush=True)
+    for pid in workers:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in workers:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import hashlib
+import os
+import pickle
+
+TABLE_VERSION = 2
+RISK_TABLE_PATH = "models/food_risk_table.pkl"
+ARTIFACT_PATHS = [
+    "models/food_analysis_model.pkl",
+    "models/food_label_encoder_y.pkl",
+    "models/food_feature_encoders.pkl",
+    "models/food_feature_names.pkl",
+    "models/food_analysis_model.ubj",
+    "models/food_analysis_model.meta.json",
+    "models/food_analysis_model.trees.npz",
+    "data/food_database_fixed.csv",
+]
+
+# Settings that pick which artifacts are loaded and how they are evaluated
+ARTIFACT_SETTINGS = {"MODEL_FORMAT": "auto", "INFERENCE_BACKEND": "xgboost"}
+
+def artifact_fingerprint(paths=ARTIFACT_PATHS):
+    """Hash the contents of the model artifacts and food CSV, plus the model format and backend settings"""
+    digest = hashlib.sha256(f"risk-table-v{TABLE_VERSION}".encode())
+    for name, default in ARTIFACT_SETTINGS.items():
+        digest.update(f"{name}={os.environ.get(name, default)}\0".encode())
+    for path in paths:
+        digest.update(path.encode())
+        if not os.path.exists(path):
+            # The native and compiled model files are optional
+            continue
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+class RiskTable:
+    """Precomputed predictions for every food in the catalog"""
+
+    def __init__(self, fingerprint, names, results):
+        self.fingerprint = fingerprint
+        self.names = names
+        self.results = results
+
+    def __len__(self):
+        return len(self.results)
+
+    def get(self, pos):
+        """Return the stored result for a catalog row, or None if it could not be scored"""
+        if pos is None or pos >= len(self.results):
+            return None
+        return self.results[pos]
+
+    def save(self, path=RISK_TABLE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({
+                "version": TABLE_VERSION,
+                "fingerprint": self.fingerprint,
+                "names": self.names,
+                "results": self.results
+            }, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=RISK_TABLE_PATH):
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if data.get("version") != TABLE_VERSION:
+            raise ValueError(f"Unsupported risk table version: {data.get('version')}")
+        return cls(data["fingerprint"], data["names"], data["results"])
+
+def build_risk_table(catalog, score_matrix, fingerprint):
+    """Score the whole catalog in one batched pass.
+
+    score_matrix maps an encoded feature matrix to one result dict per row.
+    """
+    results = score_matrix(catalog.feature_matrix)
+    names = catalog.df['Food_Name'].astype(str).tolist()
+    return RiskTable(fingerprint, names, results)
+
+def load_or_build_risk_table(catalog, score_matrix, path=RISK_TABLE_PATH):
+    """Reuse the stored table if it matches the current artifacts, otherwise rebuild and save it"""
+    fingerprint = artifact_fingerprint()
+    if os.path.exists(path):
+        try:
+            table = RiskTable.load(path)
+            if table.fingerprint == fingerprint and len(table) == len(catalog):
+                return table
+        except Exception as e:
+            print(f"⚠️  Ignoring unreadable risk table: {e}")
+    print("🧮 Precomputing risk table for the food catalog...")
+    table = build_risk_table(catalog, score_matrix, fingerprint)
+    table.save(path)
+    print(f"💾 Risk table for {len(table)} foods saved to {path}")
+    return table
+
+if __name__ == "__main__":
+    # Offline build: importing the service loads the artifacts once
+    os.environ["FOOD_RISK_TABLE"] = "1"
+    import food_service
@@ -0,0 +1,127 @@
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+class QueueFull(Exception):
+    """Raised by ScanJobQueue.submit when the backlog is at max_queue"""
+
+class ScanJobQueue:
+    """Bounded in-process job queue served by a fixed pool of worker threads.
+
+    submit() returns a job id straight away and rejects new work with
+    QueueFull once max_queue jobs are waiting. Each job runs
+    process(payload); its return value (or the exception message) is kept
+    for polling until max_results newer jobs have finished or result_ttl
+    seconds have passed.
+    """
+
+    def __init__(self, process, workers=2, max_queue=64, max_results=1000, result_ttl=3600):
+        self.process = process
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_results = max_results
+        self.result_ttl = result_ttl
+        self._pending = queue.Queue(maxsize=max_queue)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait_time = 0.0
+        self.run_time = 0.0
+
+    def _start(self):
+        # Threads start on first use, so importing the API (e.g. under the reloader) spawns none
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"scan-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, payload):
+        """Queue payload for processing and return its job id"""
+        self._start()
+        job_id = uuid.uuid4().hex
+        job = {"job_id": job_id, "status": "queued", "submitted_at": time.time()}
+        with self._lock:
+            self._jobs[job_id] = job
+        try:
+            self._pending.put_nowait((job_id, payload))
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job_id]
+                self.rejected += 1
+            raise QueueFull(f"Scan queue is full ({self.max_queue} jobs waiting)")
+        with self._lock:
+            self.submitted += 1
+        return job_id
+
+    def get(self, job_id):
+        """Snapshot of a job's state, or None if unknown or expired"""
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _work(self):
+        while True:
+            job_id, payload = self._pending.get()
+            started = time.time()
+            with self._lock:
+                job = self._jobs[job_id]
+                job["status"] = "running"
+                job["started_at"] = started
+                self.running += 1
+                self.wait_time += started - job["submitted_at"]
+            try:
+                result = self.process(payload)
+                update = {"status": "done", "result": result}
+            except Exception as e:
+                update = {"status": "failed", "error": str(e)}
+            finished = time.time()
+            with self._lock:
+                job.update(update, finished_at=finished)
+                self.running -= 1
+                self.run_time += finished - started
+                if update["status"] == "done":
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                # Finished jobs move to the end, so the oldest results are evicted first
+                self._jobs.move_to_end(job_id)
+                self._expire()
+            self._pending.task_done()
+
+    def _expire(self):
+        finished = [job_id for job_id, job in self._jobs.items() if "finished_at" in job]
+        excess = len(finished) - self.max_results
+        cutoff = time.time() - self.result_ttl if self.result_ttl else None
+        for job_id in finished:
+            if excess > 0:
+                excess -= 1
+            elif cutoff is None or self._jobs[job_id]["finished_at"] >= cutoff:
+                break
+            del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                "queue_depth": self._pending.qsize(),
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "workers": self.workers,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "avg_wait_seconds": self.wait_time / finished if finished else 0.0,
+                "avg_run_seconds": self.run_time / finished if finished else 0.0
+            }
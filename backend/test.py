@@ -1,6 +1,10 @@
+import os
+import time
 import pickle
+import tempfile
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
+from feature_encoding import build_feature_encoder
 
 def load_model_and_encoders():
     """Load the trained model and label encoders"""
@@ -8,18 +12,9 @@ def load_model_and_encoders():
     label_encoder_y = pickle.load(open("models/label_encoder_y.pkl", "rb"))
     return model, label_encoder_y
 
-def encode_categorical_features(test_df, original_df):
+def encode_categorical_features(test_df, encoder):
     """Encode categorical features using the same encoding as training"""
-    encoded_df = test_df.copy()
-    categorical_cols = encoded_df.select_dtypes(include=["object"]).columns
-    
-    for col in categorical_cols:
-        if col in original_df.columns:
-            le = LabelEncoder()
-            le.fit(original_df[col].astype(str))
-            encoded_df[col] = le.transform(encoded_df[col].astype(str))
-    
-    return encoded_df
+    return encoder.transform(test_df)
 
 def test_single_prediction():
     """Test a single custom prediction (original functionality)"""
@@ -47,7 +42,8 @@ def test_single_prediction():
         sample[col] = sample[col].astype(df[col].dtype)
 
     # Encode categorical features
-    encoded_sample = encode_categorical_features(sample, df)
+    encoder = build_feature_encoder("data/custom_nutrition_dataset.csv")
+    encoded_sample = encode_categorical_features(sample, encoder)
 
     # Predict
     pred = model.predict(encoded_sample)
@@ -67,6 +63,7 @@ def test_comprehensive_cases():
     model, label_encoder_y = load_model_and_encoders()
     df = pd.read_csv("data/custom_nutrition_dataset.csv")
     feature_cols = [c for c in df.columns if c != "Disease"]
+    encoder = build_feature_encoder("data/custom_nutrition_dataset.csv")
     
     # Test cases covering different scenarios
     test_cases = [
@@ -158,7 +155,7 @@ def test_comprehensive_cases():
         test_df = test_df[feature_cols]
         
         # Encode categorical features
-        encoded_test_df = encode_categorical_features(test_df, df)
+        encoded_test_df = encode_categorical_features(test_df, encoder)
         
         # Make prediction
         try:
@@ -188,6 +185,7 @@ def test_from_csv():
         model, label_encoder_y = load_model_and_encoders()
         original_df = pd.read_csv("data/custom_nutrition_dataset.csv")
         feature_cols = [c for c in original_df.columns if c != "Disease"]
+        encoder = build_feature_encoder("data/custom_nutrition_dataset.csv")
         
         # Load test data
         test_df = pd.read_csv("data/test_data_samples.csv")
@@ -204,7 +202,7 @@ def test_from_csv():
             sample_df = sample_df[feature_cols]
             
             # Encode categorical features
-            encoded_sample = encode_categorical_features(sample_df, original_df)
+            encoded_sample = encode_categorical_features(sample_df, encoder)
             
             # Make prediction
             prediction = model.predict(encoded_sample)
@@ -219,12 +217,799 @@ def test_from_csv():
     except Exception as e:
         print(f"❌ Error testing from CSV: {str(e)}")
 
+def test_batch_partial_failure():
+    """One bad item in /api/analyze_food/batch is reported in place; the rest are still scored"""
+    print("\n📦 Batch Partial Failure Test:")
+    print("=" * 40)
+    import food_scanner_api
+    import food_service
+
+    client = food_scanner_api.app.test_client()
+    record = food_service.catalog.get_record(0)
+    good = {col: record[col] for col in food_service.feature_cols}
+    items = [
+        record["Food_Name"],
+        {"nutritional_data": good},
+        {"nutritional_data": {**good, "Calories_per_100g": "abc"}},
+        {"nutritional_data": [1, 2, 3]},
+        {"nutritional_data": {"Calories_per_100g": 100}},
+    ]
+    response = client.post("/api/analyze_food/batch", json={"items": items})
+    assert response.status_code == 200, response.status_code
+    results = response.get_json()["results"]
+    assert len(results) == len(items)
+    assert "predicted_disease" in results[0] and "predicted_disease" in results[1]
+    assert results[2]["error"].startswith("Invalid value for Calories_per_100g")
+    assert results[3]["error"] == "nutritional_data must be an object"
+    assert results[4]["error"].startswith("Missing features")
+    for item, result in zip(items, results):
+        print(f"   {str(item)[:40]:<40} → {result.get('error') or result['predicted_disease']}")
+
+    # Oversized batches are refused before any scoring
+    limit = food_scanner_api.MAX_BATCH_ITEMS
+    food_scanner_api.MAX_BATCH_ITEMS = 3
+    try:
+        response = client.post("/api/analyze_food/batch", json={"items": items})
+        assert response.status_code == 413, response.status_code
+        assert response.get_json()["error"] == "Too many items: 5 (limit 3)"
+        assert client.post("/api/analyze_food/batch", json={"items": items[:3]}).status_code == 200
+    finally:
+        food_scanner_api.MAX_BATCH_ITEMS = limit
+    print("   ✅ batches over MAX_BATCH_ITEMS get a 413")
+
+def test_non_object_bodies_rejected():
+    """A null, array or non-JSON body is a 400 with an error message, not a 500"""
+    print("\n🚫 Request Body Shape Test:")
+    print("=" * 40)
+    import food_scanner_api
+
+    client = food_scanner_api.app.test_client()
+    for route in ("/api/analyze_food", "/api/analyze_food/batch"):
+        for body in ("null", "[1, 2]", '"apple"', "not json"):
+            response = client.post(route, data=body, content_type="application/json")
+            assert response.status_code == 400, (route, body, response.status_code)
+            assert response.get_json()["error"] == "Expected a JSON object body"
+        response = client.post(route, data="{}", content_type="text/plain")
+        assert response.status_code == 400, (route, response.status_code)
+    assert client.post("/api/analyze_food", json={}).get_json()["error"] == "No nutritional data provided"
+    print("   ✅ both analyze routes answer 400 for bodies that are not JSON objects")
+
+def test_chunked_training():
+    """Chunked encoders see every category, and the trainer writes a native model"""
+    print("\n📦 Chunked Training Test:")
+    print("=" * 40)
+    import chunked_training
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # "code" looks numeric in every chunk but the last, so it is only known to be text at the end
+        df = pd.DataFrame({
+            "code": [str(i % 7) for i in range(300)],
+            "x": np.arange(300.0),
+            "target": ["a", "b", "c"] * 100
+        })
+        df.loc[250, "code"] = "other"
+        csv_path = os.path.join(tmp, "chunks.csv")
+        df.to_csv(csv_path, index=False)
+        _, feature_classes, classes, rows = chunked_training.fit_encoders(csv_path, ["code", "x"], "target", 50)
+        assert feature_classes == {"code": sorted(df["code"].unique())}, feature_classes
+        assert classes == ["a", "b", "c"] and rows == 300
+
+        # Train, validation and test rows never overlap
+        masks = [chunked_training.split_mask(1000, 0, split, 0.2, 0.1, 42) for split in ("train", "valid", "test")]
+        assert (sum(mask.astype(int) for mask in masks) == 1).all()
+
+        # Only the trainer's own page directory is removed from a shared cache directory
+        cache_dir = os.path.join(tmp, "cache")
+        os.makedirs(cache_dir)
+        with open(os.path.join(cache_dir, "keep.txt"), "w") as f:
+            f.write("not the trainer's")
+        base = os.path.join(tmp, "food_model")
+        booster = chunked_training.train_chunked(
+            "food", chunk_rows=100, num_boost_round=20, cache_dir=cache_dir, output_base=base
+        )
+        assert booster.num_boosted_rounds() > 0
+        assert os.path.exists(f"{base}.ubj") and os.path.exists(f"{base}.meta.json")
+        assert os.listdir(cache_dir) == ["keep.txt"]
+
+def test_ocr_cache_eviction():
+    """The OCR cache keeps its most recently used entries up to max_entries"""
+    print("\n🗄️  OCR Cache Eviction Test:")
+    print("=" * 40)
+    from ocr_cache import OCRCache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ocr_cache.sqlite")
+        cache = OCRCache(path, max_entries=3)
+        # Sleeps keep access times distinct on coarse (Windows) clocks
+        for i in range(3):
+            cache.put_text(f"k{i}", f"text {i}")
+            time.sleep(0.02)
+        # Reading k0 makes k1 the least recently used
+        assert cache.get_text("k0") == "text 0"
+        time.sleep(0.02)
+        cache.put_text("k3", "text 3")
+        assert len(cache) == 3
+        assert cache.get_text("k1") is None
+        assert [cache.get_text(k) for k in ("k0", "k2", "k3")] == ["text 0", "text 2", "text 3"]
+        # Updating an entry does not count as a new one
+        cache.put_result("k3", {"calories": 100})
+        assert len(cache) == 3 and cache.get_result("k3") == {"calories": 100}
+        # The row count survives reopening the database
+        assert len(OCRCache(path, max_entries=3)) == 3
+        cache.clear()
+        assert len(cache) == 0
+        print("   ✅ evicted least recently used entry; count stays at the cap")
+
+def test_search_survives_failed_trial():
+    """A trial whose fold raises is listed as failed; the other trials still finish"""
+    print("\n🔎 Hyperparameter Search Failure Test:")
+    print("=" * 40)
+    from sklearn.datasets import make_classification
+    import hyperparam_search
+
+    X, y = make_classification(n_samples=200, n_features=6, n_informative=4, n_classes=3, random_state=0)
+    trials = [{"max_depth": 3}, {"max_depth": -1}, {"max_depth": 4}]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "leaderboard.csv")
+        rows = hyperparam_search.search(X, y, trials, folds=2, workers=2, max_rounds=20,
+                                        early_stopping_rounds=5, leaderboard_path=path)
+        leaderboard = pd.read_csv(path)
+    assert len(rows) == 3 and len(leaderboard) == 3
+    assert [row["status"] for row in rows[:2]] == ["ok", "ok"]
+    assert rows[-1]["trial"] == 1 and rows[-1]["status"].startswith("failed")
+    assert leaderboard["status"].iloc[-1].startswith("failed")
+    print(f"   ✅ {rows[-1]['status'][:60]}")
+
+def test_registry_swap():
+    """Reloads swap the whole bundle at once; a failed load keeps the active one"""
+    print("\n🔄 Model Registry Swap Test:")
+    print("=" * 40)
+    import threading
+    from types import SimpleNamespace
+    from model_registry import ModelRegistry, ReloadInProgress
+
+    with tempfile.TemporaryDirectory() as tmp:
+        artifact = os.path.join(tmp, "model.bin")
+        with open(artifact, "w") as f:
+            f.write("v1")
+        versions = iter(["v1", "v2", "v3", "v4"])
+        swaps = []
+        fail = threading.Event()
+        loading = threading.Event()
+        release = threading.Event()
+
+        def load():
+            if fail.is_set():
+                raise RuntimeError("corrupt artifact")
+            if loading.is_set():
+                release.wait(5)
+            return SimpleNamespace(version=next(versions))
+
+        registry = ModelRegistry(load, [artifact], on_swap=lambda old, new: swaps.append((old.version, new.version)),
+                                 interval=0.05)
+        assert registry.reload("startup").version == "v1" and swaps == []
+        assert registry.reload("manual").version == "v2" and swaps == [("v1", "v2")]
+
+        fail.set()
+        try:
+            registry.reload("manual")
+            assert False, "a failed load must raise"
+        except RuntimeError:
+            pass
+        assert registry.current.version == "v2" and registry.status()["last_error"]["error"] == "corrupt artifact"
+        fail.clear()
+
+        # A second reload while one is loading is refused, and the old bundle keeps serving
+        loading.set()
+        assert registry.reload_async("slow")
+        time.sleep(0.05)
+        try:
+            registry.reload("manual")
+            assert False, "a concurrent reload must be refused"
+        except ReloadInProgress:
+            pass
+        assert registry.current.version == "v2"
+        release.set()
+        for _ in range(100):
+            if registry.current.version == "v3":
+                break
+            time.sleep(0.02)
+        assert registry.current.version == "v3" and swaps[-1] == ("v2", "v3")
+        loading.clear()
+
+        # The watcher reloads once the artifact has changed and settled
+        time.sleep(0.02)
+        with open(artifact, "w") as f:
+            f.write("v4 with more bytes")
+        registry.watch()
+        for _ in range(200):
+            if registry.current.version == "v4":
+                break
+            time.sleep(0.02)
+        assert registry.current.version == "v4"
+        assert [r["reason"] for r in registry.status()["reloads"]] == ["startup", "manual", "slow", "artifacts changed"]
+        # Park the watcher thread before the artifact is deleted with the directory
+        registry.interval = 3600
+        time.sleep(0.1)
+        print(f"   ✅ swaps: {swaps}")
+
+def test_prediction_cache():
+    """LRU eviction, TTL expiry and canonical keys of the prediction cache"""
+    print("\n🧊 Prediction Cache Test:")
+    print("=" * 40)
+    from prediction_cache import PredictionCache
+
+    cache = PredictionCache(maxsize=2)
+    # Values equal after rounding share a key; column order does not matter when columns are given
+    assert cache.make_key([1.00001, "Snack", float("nan")]) == cache.make_key([1.0, "Snack", np.nan])
+    assert cache.make_key([1, 2], ["a", "b"]) == cache.make_key([2, 1], ["b", "a"])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    stats = cache.stats()
+    assert (stats["size"], stats["evictions"], stats["hits"], stats["misses"]) == (2, 1, 3, 1)
+
+    cache = PredictionCache(maxsize=10, ttl=0.05)
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.1)
+    assert cache.get("a") is None and cache.stats()["size"] == 0
+    print("   ✅ LRU order, TTL expiry and key canonicalization hold")
+
+def reference_nutritional_analysis(nutritional_data):
+    """The original if/elif rules the table-driven engine replaced"""
+    concerns, recommendations = [], []
+    score = 100
+    get = nutritional_data.get
+    if get('Processing_Level', 0) > 7:
+        score -= 25
+        concerns.append("Highly processed food")
+    elif get('Processing_Level', 0) > 5:
+        score -= 10
+        concerns.append("Moderately processed food")
+    if get('Nutritional_Density', 10) < 5:
+        score -= 15
+        concerns.append("Low nutritional density")
+    if get('Sugar_per_100g', 0) > 15:
+        score -= 15
+        concerns.append("High sugar content")
+    elif get('Sugar_per_100g', 0) > 10:
+        score -= 7
+        concerns.append("Moderate sugar content")
+    if get('Sodium_per_100g', 0) > 400:
+        score -= 15
+        concerns.append("Very high sodium content")
+    elif get('Sodium_per_100g', 0) > 200:
+        score -= 7
+        concerns.append("Moderate sodium content")
+    if get('Fat_per_100g', 0) > 20:
+        score -= 10
+        concerns.append("High fat content")
+    if get('Fiber_per_100g', 10) < 3:
+        score -= 10
+        concerns.append("Low fiber content")
+    if get('Additives_Count', 0) > 5:
+        score -= 10
+        concerns.append("Contains many additives")
+    if score < 50:
+        recommendations.append("Consider healthier alternatives with less processing and additives.")
+    if get('Processing_Level', 0) > 5:
+        recommendations.append("Choose less processed foods.")
+    if get('Sugar_per_100g', 0) > 10:
+        recommendations.append("Reduce sugar intake.")
+    if get('Sodium_per_100g', 0) > 200:
+        recommendations.append("Reduce sodium intake.")
+    return {"health_score": max(0, score), "concerns": concerns, "recommendations": recommendations}
+
+def test_rule_engine_parity():
+    """The vectorized rule engine matches the original rules, one dict at a time and over a whole frame"""
+    print("\n📏 Rule Engine Parity Test:")
+    print("=" * 40)
+    from nutrition_rules import RuleEngine
+
+    engine = RuleEngine()
+    rng = np.random.default_rng(0)
+    fields = {
+        "Processing_Level": 10, "Nutritional_Density": 10, "Sugar_per_100g": 30, "Sodium_per_100g": 800,
+        "Fat_per_100g": 40, "Fiber_per_100g": 8, "Additives_Count": 10
+    }
+    for _ in range(2000):
+        # Random subsets exercise the per-field defaults; integers hit the thresholds exactly
+        data = {field: int(rng.integers(0, high + 1)) for field, high in fields.items() if rng.random() < 0.8}
+        assert engine.analyze(data) == reference_nutritional_analysis(data), data
+
+    df = pd.read_csv("data/food_database_fixed.csv")
+    result = engine.evaluate(df)
+    concerns = engine.concerns(result["concern_mask"])
+    recommendations = engine.recommendations(result["recommendation_mask"])
+    for i, record in enumerate(df.to_dict(orient="records")):
+        expected = reference_nutritional_analysis(record)
+        assert int(result["health_score"][i]) == expected["health_score"]
+        assert concerns[i] == expected["concerns"] and recommendations[i] == expected["recommendations"]
+    print(f"   ✅ 2000 random dicts and {len(df)} catalog rows match")
+
+US_LABEL = """Nutrition Facts
+Serving Size 1 cup (228g)
+Servings Per Container 2
+Calories 250
+Total Fat 12g
+Saturated Fat 3g
+Sodium 470mg
+Total Carbohydrate 31g
+Dietary Fiber 0g
+Sugars 5g
+Protein 5g
+Ingredients: enriched flour, high fructose corn syrup, artificial flavor, preservatives"""
+
+def reference_parse(text):
+    """The original one-re.search-per-pattern label parser"""
+    import re
+    patterns = {
+        'calories': r'calories?\s*:?\s*(\d+)',
+        'protein': r'protein\s*:?\s*(\d+(?:\.\d+)?)\s*g',
+        'carbohydrates': r'carbohydrates?\s*:?\s*(\d+(?:\.\d+)?)\s*g',
+        'carbs': r'carbs?\s*:?\s*(\d+(?:\.\d+)?)\s*g',
+        'fat': r'total\s*fat\s*:?\s*(\d+(?:\.\d+)?)\s*g',
+        'saturated_fat': r'saturated\s*fat\s*:?\s*(\d+(?:\.\d+)?)\s*g',
+        'sugar': r'sugars?\s*:?\s*(\d+(?:\.\d+)?)\s*g',
+        'sodium': r'sodium\s*:?\s*(\d+(?:\.\d+)?)\s*mg',
+        'fiber': r'dietary\s*fiber\s*:?\s*(\d+(?:\.\d+)?)\s*g',
+        'serving_size': r'serving\s*size\s*:?\s*([^\n]+)',
+        'servings_per_container': r'servings?\s*per\s*container\s*:?\s*(\d+(?:\.\d+)?)'
+    }
+    parsed = {}
+    for key, pattern in patterns.items():
+        match = re.search(pattern, text.lower())
+        if match:
+            parsed[key] = match.group(1).strip() if key == 'serving_size' else float(match.group(1))
+    return parsed
+
+def test_label_parser():
+    """Single-pass label parsing matches the original patterns and handles units and other languages"""
+    print("\n🏷️  Label Parser Test:")
+    print("=" * 40)
+    from label_reader import FoodLabelReader
+
+    reader = FoodLabelReader(ocr_backend='pytesseract')
+    variants = [
+        US_LABEL,
+        US_LABEL.replace("\n", "  "),
+        "CALORIES: 90\nCarbs 12.5 g\nsugar 0.5g sodium 5 mg\nprotein:3g",
+        "calorie 40 carbohydrates 9g carbs 8g sugars 2g saturated fat 0.5g",
+        "no nutrition facts here",
+    ]
+    for text in variants:
+        assert reader.parse_nutritional_info(text) == reference_parse(text), text
+
+    assert reader.detect_food_category(US_LABEL) == 'Mixed'
+    # high fructose, corn syrup, artificial, preservatives
+    assert reader.estimate_processing_level(US_LABEL) == 9
+
+    spanish = ("Información nutricional\nEnergía 1046 kJ\nGrasas 3,5 g\nHidratos de carbono 40 g\n"
+               "Azúcares 12,5 g\nProteínas 8 g\nSodio 0,4 g\nFibra alimentaria 2 g\nOrganic whole grain oats")
+    parsed = reader.parse_nutritional_info(spanish)
+    assert abs(parsed.pop('calories') - 1046 / 4.184) < 1e-9
+    assert parsed == {'protein': 8.0, 'carbohydrates': 40.0, 'fat': 3.5, 'sugar': 12.5, 'sodium': 400.0, 'fiber': 2.0}
+    assert reader.detect_food_category(spanish) == 'Whole Food'
+    assert reader.parse_nutritional_info("energy 100 kcal\ncalories 120") == {'calories': 120.0}
+    print(f"   ✅ {len(variants)} English labels match the original parser; units and Spanish parse")
+
+def test_incremental_training():
+    """Incremental updates boost only on new rows, skip when nothing changed and fall back on new categories"""
+    print("\n🍎 Incremental Training Test:")
+    print("=" * 40)
+    import shutil
+    import train_model
+
+    cwd = os.getcwd()
+    source = os.path.abspath(train_model.FOOD_DATA_PATH)
+    with tempfile.TemporaryDirectory() as tmp:
+        # The trainer uses the repo's relative data/ and models/ paths; keep the real artifacts untouched
+        os.makedirs(os.path.join(tmp, "data"))
+        os.makedirs(os.path.join(tmp, "models"))
+        shutil.copy(source, os.path.join(tmp, "data", os.path.basename(source)))
+        os.chdir(tmp)
+        try:
+            full = train_model.train_food_model({"n_estimators": 20})
+            full_rounds = full.get_booster().num_boosted_rounds()
+            assert train_model.train_food_model_incremental(rounds=5) is None
+
+            df = pd.read_csv(train_model.FOOD_DATA_PATH)
+            new = df.sample(10, random_state=0).assign(Calories_per_100g=lambda d: d["Calories_per_100g"] + 1)
+            new.to_csv(train_model.FOOD_DATA_PATH, mode="a", header=False, index=False)
+            updated = train_model.train_food_model_incremental(rounds=5)
+            assert updated.get_booster().num_boosted_rounds() == full_rounds + 5
+            state, trained, _ = train_model.load_training_state()
+            assert len(trained) == len(df) + 10 and state is not None
+            assert train_model.train_food_model_incremental(rounds=5) is None
+
+            # A category the stored encoders lack forces a full retrain
+            new.head(1).assign(Food_Category="Brand New Category").to_csv(
+                train_model.FOOD_DATA_PATH, mode="a", header=False, index=False
+            )
+            retrained = train_model.train_food_model_incremental(rounds=5, params={"n_estimators": 20})
+            assert retrained.get_booster().num_boosted_rounds() == full_rounds
+        finally:
+            os.chdir(cwd)
+    print(f"   ✅ {full_rounds} rounds, +5 on new rows, no-op when unchanged, full retrain on new categories")
+
+def test_compiled_trees_written_at_save():
+    """save_native writes the compiled trees, so a compiled-backend load never writes an artifact"""
+    print("\n🌲 Compiled Trees Test:")
+    print("=" * 40)
+    from model_store import save_native, load_model
+    from tree_inference import TreeEnsemble
+
+    model = pickle.load(open("models/food_analysis_model.pkl", "rb"))
+    label_encoder_y = pickle.load(open("models/food_label_encoder_y.pkl", "rb"))
+    feature_cols = pickle.load(open("models/food_feature_names.pkl", "rb"))
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, "food_model")
+        save_native(model, label_encoder_y, base, feature_cols)
+        trees = f"{base}.trees.npz"
+        assert os.path.exists(trees)
+        written = os.stat(trees).st_mtime_ns
+        loaded, _, _ = load_model("missing.pkl", "missing.pkl", base, backend="compiled")
+        assert isinstance(loaded, TreeEnsemble) and os.stat(trees).st_mtime_ns == written
+    print("   ✅ trees compiled at save time and reused on load")
+
+def test_micro_batcher():
+    """Concurrent submits share one predict call, each caller gets its own rows, errors and close() reach every waiter"""
+    print("\n🧺 Micro-Batcher Test:")
+    print("=" * 40)
+    import threading
+    from micro_batching import MicroBatcher
+
+    def run_callers(batcher, n):
+        results, errors = [None] * n, [None] * n
+
+        def call(i):
+            try:
+                results[i] = batcher.submit(np.array([[i, i]], dtype=np.float32))
+            except Exception as e:
+                errors[i] = e
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(n)]
+        for thread in threads:
+            thread.start()
+        return threads, results, errors
+
+    def join(threads):
+        for thread in threads:
+            thread.join(5)
+        assert not any(thread.is_alive() for thread in threads), "a caller is still waiting"
+
+    batches = []
+
+    def predict(X):
+        batches.append(len(X))
+        return X[:, 0] * 10
+
+    # Eight callers inside one long window are coalesced, and each gets its own row back
+    batcher = MicroBatcher(predict, window=0.5, max_batch=64)
+    threads, results, errors = run_callers(batcher, 8)
+    join(threads)
+    assert errors == [None] * 8
+    assert [float(result[0]) for result in results] == [i * 10.0 for i in range(8)]
+    assert batcher.stats()["largest_batch"] > 1 and sum(batches) == 8 and len(batches) < 8
+
+    # A model error is raised in every caller of the batch
+    def fail(X):
+        raise RuntimeError("model exploded")
+
+    batcher = MicroBatcher(fail, window=0.2)
+    threads, results, errors = run_callers(batcher, 4)
+    join(threads)
+    assert all(isinstance(e, RuntimeError) for e in errors), errors
+
+    # close() while a batch is predicting and more callers are queued: all of them still return
+    gate = threading.Event()
+    started = threading.Event()
+
+    def slow(X):
+        started.set()
+        gate.wait(5)
+        return X[:, 0] * 10
+
+    batcher = MicroBatcher(slow, window=0.0)
+    first, first_results, _ = run_callers(batcher, 1)
+    assert started.wait(5)
+    queued, queued_results, queued_errors = run_callers(batcher, 3)
+    time.sleep(0.05)
+    batcher.close()
+    gate.set()
+    join(first + queued)
+    assert float(first_results[0][0]) == 0.0 and queued_errors == [None] * 3
+    assert [float(result[0]) for result in queued_results] == [0.0, 10.0, 20.0]
+    # A retired batcher predicts directly
+    assert float(batcher.submit(np.array([[7, 7]], dtype=np.float32))[0]) == 70.0
+    print(f"   ✅ batches {batches}, errors and close() delivered to every caller")
+
+def wait_for(condition, timeout=5):
+    """Poll condition() until it is true; fails the test after timeout seconds"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting"
+        time.sleep(0.01)
+
+def test_scan_job_queue():
+    """Scan jobs go queued -> running -> done/failed, a full queue is refused (503) and results expire"""
+    print("\n📷 Scan Job Queue Test:")
+    print("=" * 40)
+    import threading
+    import food_scanner_api
+    from scan_jobs import ScanJobQueue, QueueFull
+
+    gate = threading.Event()
+
+    def process(payload):
+        gate.wait(5)
+        if payload == b"bad":
+            raise ValueError("unreadable label")
+        return {"size": len(payload)}
+
+    jobs = ScanJobQueue(process, workers=1, max_queue=1, result_ttl=0.2)
+    first = jobs.submit(b"good")
+    wait_for(lambda: jobs.get(first)["status"] == "running")
+    second = jobs.submit(b"bad")
+    assert jobs.get(second)["status"] == "queued"
+    try:
+        jobs.submit(b"one too many")
+        assert False, "a full queue must refuse new jobs"
+    except QueueFull:
+        pass
+    assert jobs.stats()["rejected"] == 1
+
+    gate.set()
+    wait_for(lambda: jobs.get(second)["status"] == "failed")
+    assert jobs.get(first)["status"] == "done" and jobs.get(first)["result"] == {"size": 4}
+    assert jobs.get(second)["error"] == "unreadable label"
+    time.sleep(0.3)
+    assert jobs.get(first) is None and jobs.get(second) is None
+
+    # The API maps a full queue to 503 and unknown or expired ids to 404
+    client = food_scanner_api.app.test_client()
+    gate.clear()
+    api_jobs = ScanJobQueue(process, workers=1, max_queue=1)
+    original, food_scanner_api.scan_queue = food_scanner_api.scan_queue, api_jobs
+    try:
+        accepted = client.post("/api/scan_label", data=b"image one")
+        assert accepted.status_code == 202
+        job_id = accepted.get_json()["job_id"]
+        wait_for(lambda: api_jobs.get(job_id)["status"] == "running")
+        assert client.post("/api/scan_label", data=b"image two").status_code == 202
+        full = client.post("/api/scan_label", data=b"image three")
+        assert full.status_code == 503 and full.headers["Retry-After"] == "5"
+        assert client.get(f"/api/scan_label/{job_id}").get_json()["status"] == "running"
+        assert client.get("/api/scan_label/no-such-job").status_code == 404
+        gate.set()
+        wait_for(lambda: client.get(f"/api/scan_label/{job_id}").get_json()["status"] == "done")
+    finally:
+        gate.set()
+        food_scanner_api.scan_queue = original
+    print("   ✅ lifecycle, backpressure (503), expiry and 404 behave")
+
+def test_trigram_search_parity():
+    """Trigram search returns what a str.contains / startswith scan of the catalog returns"""
+    print("\n🔍 Trigram Search Parity Test:")
+    print("=" * 40)
+    from food_catalog import FoodCatalog
+
+    catalog = FoodCatalog("data/food_database_fixed.csv")
+    rng = np.random.default_rng(0)
+
+    def queries():
+        names = catalog._names()
+        picked = []
+        for _ in range(80):
+            name = names[rng.integers(len(names))]
+            size = int(rng.integers(1, 9))
+            start = int(rng.integers(0, max(1, len(name) - size + 1)))
+            picked.append(name[start:start + size])
+        # Short queries, case, absent and space-only queries
+        return picked + ["a", "Ch", "OAT", " ", "e ", "zzqx", "salad with", "CHICKEN"]
+
+    def check(limit=10):
+        names = pd.Series(catalog._names()).str.lower()
+        for query in queries():
+            for prefix in (False, True):
+                lowered = query.lower()
+                mask = names.str.startswith(lowered) if prefix else names.str.contains(lowered, regex=False)
+                expected = list(np.flatnonzero(mask.to_numpy())[:limit])
+                assert catalog.search_index.search(query, limit=limit, prefix=prefix) == expected, (query, prefix)
+                found = catalog.search(query, limit=limit, prefix=prefix)["Food_Name"].astype(str).tolist()
+                assert found == [catalog._names()[i] for i in expected], (query, prefix)
+
+    check()
+    record = {**catalog.get_record(0), "Food_Name": "Zucchini Quinoa Crunch Bowl"}
+    catalog.add_food(record)
+    check()
+    catalog.compact()
+    check()
+    catalog.add_food({**record, "Food_Name": "Quinoa zucchini fritters"})
+    check(limit=50)
+    assert catalog.search_index.search("zucchini", limit=50) == [len(catalog) - 2, len(catalog) - 1]
+    print(f"   ✅ substring and prefix searches match a full scan before and after add_food/compact")
+
+def test_columnar_store():
+    """The columnar build round-trips a CSV through memory-mapped arrays and falls back to the CSV when stale"""
+    print("\n🗃️  Columnar Store Test:")
+    print("=" * 40)
+    import json
+    from columnar_store import build_columnar, open_columnar, read_table, columnar_path, DictionaryColumn, MANIFEST
+    from food_catalog import FoodCatalog
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "foods.csv")
+        pd.DataFrame({
+            "Food_Name": ["Oat Bowl", "Fried Chicken", "Green Salad", "Oat Bowl"],
+            "Food_Category": ["Whole Food", "Fast Food", None, "Whole Food"],
+            "Calories_per_100g": [256.0, np.nan, 35.5, 256.0],
+            "Additives_Count": [0, 4, 0, 1],
+            "Organic": [True, False, True, False],
+        }).to_csv(csv_path, index=False)
+        build_columnar(csv_path)
+
+        columns = open_columnar(csv_path)
+        category = columns["Food_Category"]
+        assert isinstance(category, DictionaryColumn) and isinstance(columns["Additives_Count"], np.memmap)
+        assert list(category.dictionary) == ["Whole Food", "Fast Food"] and list(category.codes) == [0, 1, -1, 0]
+        assert category.item(0) == "Whole Food" and pd.isna(category.tolist()[2])
+
+        expected = pd.read_csv(csv_path)
+        pd.testing.assert_frame_equal(read_table(csv_path), expected)
+        catalog = FoodCatalog(csv_path)
+        assert catalog.columns is not None
+        pd.testing.assert_frame_equal(catalog.df, expected)
+        assert catalog.find("green salad") == 2 and catalog.get_record(1)["Additives_Count"] == 4
+
+        # A CSV edited after the build is read directly
+        with open(csv_path, "a") as f:
+            f.write("Fruit Cup,Whole Food,50.0,0,True\n")
+        assert open_columnar(csv_path) is None
+        assert len(read_table(csv_path)) == 5 and FoodCatalog(csv_path).columns is None
+
+        # So is a build in another format version
+        build_columnar(csv_path)
+        assert open_columnar(csv_path) is not None
+        manifest_path = os.path.join(columnar_path(csv_path), MANIFEST)
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        with open(manifest_path, "w") as f:
+            json.dump({**manifest, "version": manifest["version"] + 1}, f)
+        assert open_columnar(csv_path) is None
+        pd.testing.assert_frame_equal(read_table(csv_path), pd.read_csv(csv_path))
+    print("   ✅ memory-mapped columns match read_csv; stale or foreign builds fall back to the CSV")
+
+def test_nhanes_merge_parity():
+    """The chunked NHANES merge matches the original eager merge, reduced to one row per participant"""
+    print("\n🧬 NHANES Merge Parity Test:")
+    print("=" * 40)
+    from data import dataset
+
+    rng = np.random.default_rng(0)
+    # Participant 4 has no demographic row, 2 and 6 no prescriptions, 7 only prescriptions
+    present = {"demographic": [1, 2, 3, 5, 6], "diet": [1, 2, 3, 4, 5, 6],
+               "examination": [6, 5, 4, 3, 2, 1], "labs": [1, 2, 3, 4, 5, 6]}
+    medications = pd.DataFrame({
+        "SEQN": [1, 1, 3, 1, 5, 5, 7],
+        "RXDUSE": [1, 1, 2, 1, 1, 1, 1],
+        "RXDDRUG": ["METFORMIN", "LISINOPRIL", None, "99999", "ATORVASTATIN", "INSULIN", "ASPIRIN"],
+        "RXDDAYS": [400, 90, np.nan, np.nan, 30, 2000, 10],
+        "RXDRSC1": ["E11", "I10", None, None, "E78.5", "E10", "R51"],
+        "RXDRSC2": [None, "E11.9", None, None, None, "N18.3", None],
+        "RXDRSC3": [None, None, None, None, None, None, None],
+        "RXDCOUNT": [3, 3, 1, 3, 2, 2, 1],
+    })
+    with tempfile.TemporaryDirectory() as tmp:
+        frames = {}
+        for name, (filename, columns) in dataset.SOURCES.items():
+            seqn = present[name]
+            frame = pd.DataFrame({"SEQN": seqn, **{col: rng.normal(50, 20, len(seqn)).round(3) for col in columns}})
+            # Columns the merge does not need, and a few blank answers
+            frame[f"{name.upper()}_EXTRA"] = rng.integers(0, 9, len(seqn))
+            frame.iloc[0, 1] = np.nan
+            frame.to_csv(os.path.join(tmp, filename), index=False)
+            frames[name] = frame
+        medications.to_csv(os.path.join(tmp, dataset.MEDICATIONS), index=False, encoding="latin1")
+
+        master = dataset.build_nhanes_master(tmp, chunk_rows=2)
+
+        # The original script: inner joins of everything, then a left join of the prescription rows
+        base = frames["demographic"]
+        for name in ("diet", "examination", "labs"):
+            base = base.merge(frames[name], on="SEQN", how="inner")
+        base = base.merge(pd.read_csv(os.path.join(tmp, dataset.MEDICATIONS), encoding="latin1"), on="SEQN", how="left")
+
+    needed = [col for _, columns in dataset.SOURCES.values() for col in columns]
+    expected = base.drop_duplicates("SEQN").set_index("SEQN")[needed].sort_index()
+    by_seqn = base.groupby("SEQN")
+    drug = base["RXDDRUG"]
+    expected["rx_count"] = (drug.notna() & ~drug.astype(str).isin(dataset.NO_DRUG)).groupby(base["SEQN"]).sum()
+    expected["rx_max_days"] = by_seqn["RXDDAYS"].max()
+    for flag, prefixes in dataset.RX_CONDITIONS.items():
+        hit = np.logical_or.reduce([base[col].fillna("").astype(str).str.startswith(prefixes)
+                                    for col in ("RXDRSC1", "RXDRSC2", "RXDRSC3")])
+        expected[flag] = pd.Series(hit, index=base.index).groupby(base["SEQN"]).max().astype(int)
+    expected = expected.reset_index()
+
+    assert master["SEQN"].tolist() == [1, 2, 3, 5, 6]
+    pd.testing.assert_frame_equal(master, expected, check_dtype=False, rtol=1e-6, atol=1e-4)
+    row = master.set_index("SEQN").loc[1]
+    assert row["rx_count"] == 2 and row["rx_max_days"] == 400 and row["rx_diabetes"] == 1 and row["rx_hypertension"] == 1
+    print(f"   ✅ {len(master)} participants x {master.shape[1]} columns match the eager merge")
+
+def test_tesserocr_failed_engine_frees_slot():
+    """An engine that fails to start gives its pool slot back"""
+    print("\n🔤 Tesserocr Engine Pool Test:")
+    print("=" * 40)
+    import sys
+    import types
+    import label_reader
+
+    class FakeEngine:
+        def SetPageSegMode(self, psm):
+            pass
+
+        def SetImage(self, image):
+            pass
+
+        def GetUTF8Text(self):
+            return "Calories 100"
+
+    failures = [RuntimeError("Failed to init API, possibly an invalid tessdata path")]
+    def start_engine(**kwargs):
+        if failures:
+            raise failures.pop()
+        return FakeEngine()
+
+    fake = types.SimpleNamespace(PyTessBaseAPI=start_engine, OEM=int, PSM=int)
+    saved = sys.modules.get("tesserocr")
+    sys.modules["tesserocr"] = fake
+    try:
+        backend = label_reader.TesserocrBackend(workers=1)
+    finally:
+        if saved is None:
+            sys.modules.pop("tesserocr")
+        else:
+            sys.modules["tesserocr"] = saved
+    image = np.zeros((4, 4), dtype=np.uint8)
+    try:
+        backend.image_to_string(image, "--oem 3")
+        raise AssertionError("engine start failure was swallowed")
+    except RuntimeError:
+        pass
+    assert backend._created == 0
+    # The only slot is free again, so this call starts an engine instead of waiting forever
+    assert backend.image_to_string(image, "--oem 3 --psm 6") == "Calories 100"
+    assert backend._created == 1 and backend._engines.qsize() == 1
+    print("   ✅ failed start released its slot; next call got an engine")
+
 if __name__ == "__main__":
     try:
         # Run all tests
         test_single_prediction()
         test_comprehensive_cases()
         test_from_csv()
+        test_batch_partial_failure()
+        test_non_object_bodies_rejected()
+        test_chunked_training()
+        test_ocr_cache_eviction()
+        test_search_survives_failed_trial()
+        test_registry_swap()
+        test_prediction_cache()
+        test_rule_engine_parity()
+        test_label_parser()
+        test_incremental_training()
+        test_compiled_trees_written_at_save()
+        test_micro_batcher()
+        test_scan_job_queue()
+        test_trigram_search_parity()
+        test_columnar_store()
+        test_nhanes_merge_parity()
+        test_tesserocr_failed_engine_frees_slot()
         print("\n✅ All tests completed!")
         
     except Exception as e:
@@ -1,14 +1,52 @@
-import pandas as pd
+import xgboost as xgb
 from xgboost import XGBClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import accuracy_score, classification_report
 import pickle
 import os
+import json
+import time
+import numpy as np
+import pandas as pd
+from columnar_store import read_table
+from model_store import save_native
 
-def train_user_model():
-    print("🔵 Training user nutrition model...")
-    df = pd.read_csv("data/custom_nutrition_dataset.csv")
+# Fixed parameters used when no search result is supplied
+BASE_PARAMS = {
+    "n_estimators": 200,
+    "learning_rate": 0.1,
+    "max_depth": 6,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "random_state": 42,
+    "use_label_encoder": False,
+    "eval_metric": "mlogloss"
+}
+FOOD_DATA_PATH = "data/food_database_fixed.csv"
+# Which CSV rows the current food model has seen, for incremental updates
+FOOD_TRAINING_STATE = "models/food_training_state.json"
+FOOD_TRAINED_ROWS = "models/food_trained_rows.npz"
+
+def booster_params(params, num_class):
+    """BASE_PARAMS (XGBClassifier names) translated for xgb.train"""
+    params = {**BASE_PARAMS, **(params or {})}
+    return {
+        "objective": "multi:softprob" if num_class > 2 else "binary:logistic",
+        **({"num_class": num_class} if num_class > 2 else {}),
+        "eta": params["learning_rate"],
+        "max_depth": params["max_depth"],
+        "subsample": params["subsample"],
+        "colsample_bytree": params["colsample_bytree"],
+        "seed": params["random_state"],
+        "eval_metric": "mlogloss" if num_class > 2 else "logloss",
+        "tree_method": "hist",
+        **{key: params[key] for key in ("min_child_weight", "reg_lambda", "gamma") if key in params}
+    }
+
+def load_user_data():
+    """Encoded user dataset: (X, y, label_encoder_y)"""
+    df = read_table("data/custom_nutrition_dataset.csv")
     target_col = "Disease"
     X = df.drop(columns=[target_col])
     y = df[target_col]
@@ -17,32 +55,12 @@ def train_user_model():
         X[col] = le.fit_transform(X[col].astype(str))
     label_encoder_y = LabelEncoder()
     y = label_encoder_y.fit_transform(y.astype(str))
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
-    )
-    model = XGBClassifier(
-        n_estimators=200,
-        learning_rate=0.1,
-        max_depth=6,
-        subsample=0.8,
-        colsample_bytree=0.8,
-        random_state=42,
-        use_label_encoder=False,
-        eval_metric="mlogloss"
-    )
-    model.fit(X_train, y_train)
-    y_pred = model.predict(X_test)
-    print("\n✅ Accuracy:", accuracy_score(y_test, y_pred))
-    print("\n📊 Classification Report:\n", classification_report(y_test, y_pred))
-    os.makedirs("models", exist_ok=True)
-    pickle.dump(model, open("models/xgboost_model.pkl", "wb"))
-    pickle.dump(label_encoder_y, open("models/label_encoder_y.pkl", "wb"))
-    print("\n💾 User model saved to models/xgboost_model.pkl")
-    print("💾 User target label encoder saved to models/label_encoder_y.pkl")
+    return X, y, label_encoder_y
 
-def train_food_model():
-    print("🍎 Training food label model...")
-    df = pd.read_csv("data/food_database_fixed.csv")
+def load_food_data(df=None):
+    """Encoded food catalog: (X, y, label_encoder_y, label_encoders, feature_cols)"""
+    if df is None:
+        df = read_table(FOOD_DATA_PATH)
     target_col = "Disease_Risk"
     feature_cols = [col for col in df.columns if col not in [target_col, 'Food_Name']]
     X = df[feature_cols]
@@ -55,42 +73,190 @@ def train_food_model():
         label_encoders[col] = le
     label_encoder_y = LabelEncoder()
     y = label_encoder_y.fit_transform(y.astype(str))
+    return X, y, label_encoder_y, label_encoders, feature_cols
+
+def train_user_model(params=None):
+    print("🔵 Training user nutrition model...")
+    X, y, label_encoder_y = load_user_data()
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=42, stratify=y
     )
-    model = XGBClassifier(
-        n_estimators=200,
-        learning_rate=0.1,
-        max_depth=6,
-        subsample=0.8,
-        colsample_bytree=0.8,
-        random_state=42,
-        use_label_encoder=False,
-        eval_metric="mlogloss"
-    )
+    model = XGBClassifier(**{**BASE_PARAMS, **(params or {})})
     model.fit(X_train, y_train)
     y_pred = model.predict(X_test)
-    print(f"\n✅ Model Accuracy: {accuracy_score(y_test, y_pred):.3f}")
-    print(f"\n📊 Classification Report:")
-    print(classification_report(y_test, y_pred, target_names=label_encoder_y.classes_))
+    print("\n✅ Accuracy:", accuracy_score(y_test, y_pred))
+    print("\n📊 Classification Report:\n", classification_report(y_test, y_pred))
+    os.makedirs("models", exist_ok=True)
+    pickle.dump(model, open("models/xgboost_model.pkl", "wb"))
+    pickle.dump(label_encoder_y, open("models/label_encoder_y.pkl", "wb"))
+    save_native(model, label_encoder_y, "models/xgboost_model", list(X.columns))
+    print("\n💾 User model saved to models/xgboost_model.pkl and models/xgboost_model.ubj")
+    print("💾 User target label encoder saved to models/label_encoder_y.pkl")
+
+def row_hashes(df):
+    """One uint64 per CSV row, so a later run can tell which rows are new or changed"""
+    # Numbers as float64 and the rest as str, so the hash does not depend on inferred dtypes
+    canonical = pd.DataFrame({
+        col: df[col].astype(np.float64) if pd.api.types.is_numeric_dtype(df[col]) else df[col].astype(str)
+        for col in df.columns
+    })
+    return pd.util.hash_pandas_object(canonical, index=False).to_numpy()
+
+def load_training_state():
+    """(state dict, row hashes, held-out row hashes) for the current food model, or Nones"""
+    if not (os.path.exists(FOOD_TRAINING_STATE) and os.path.exists(FOOD_TRAINED_ROWS)):
+        return None, None, None
+    with open(FOOD_TRAINING_STATE) as f:
+        state = json.load(f)
+    with np.load(FOOD_TRAINED_ROWS) as rows:
+        return state, rows["rows"], rows["held_out"]
+
+def save_training_state(hashes, held_out, seconds, full):
+    """Record the rows behind the saved model (and the ones it was tested on);
+    full retrains also record their duration"""
+    state = (load_training_state()[0] or {}) if not full else {}
+    if full:
+        state.update({"full_train_seconds": seconds, "full_train_rows": int(len(hashes)), "incremental_updates": 0})
+    else:
+        state["incremental_updates"] = state.get("incremental_updates", 0) + 1
+    state.update({"rows": int(len(hashes)), "last_run_seconds": seconds, "updated_at": time.time()})
+    os.makedirs("models", exist_ok=True)
+    np.savez(FOOD_TRAINED_ROWS, rows=hashes, held_out=held_out)
+    with open(FOOD_TRAINING_STATE, "w") as f:
+        json.dump(state, f, indent=2)
+
+def clear_training_state():
+    """Forget the training record, e.g. after the model was replaced by another trainer"""
+    for path in (FOOD_TRAINING_STATE, FOOD_TRAINED_ROWS):
+        if os.path.exists(path):
+            os.remove(path)
+
+def save_food_model(model, label_encoder_y, label_encoders, feature_cols):
     os.makedirs("models", exist_ok=True)
     pickle.dump(model, open("models/food_analysis_model.pkl", "wb"))
     pickle.dump(label_encoder_y, open("models/food_label_encoder_y.pkl", "wb"))
     pickle.dump(label_encoders, open("models/food_feature_encoders.pkl", "wb"))
     pickle.dump(feature_cols, open("models/food_feature_names.pkl", "wb"))
-    print(f"\n💾 Food model saved to models/food_analysis_model.pkl")
+    save_native(model, label_encoder_y, "models/food_analysis_model", feature_cols, label_encoders)
+
+def train_food_model(params=None):
+    print("🍎 Training food label model...")
+    started = time.perf_counter()
+    df = read_table(FOOD_DATA_PATH)
+    X, y, label_encoder_y, label_encoders, feature_cols = load_food_data(df)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+    model = XGBClassifier(**{**BASE_PARAMS, **(params or {})})
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+    print(f"\n✅ Model Accuracy: {accuracy_score(y_test, y_pred):.3f}")
+    print(f"\n📊 Classification Report:")
+    print(classification_report(y_test, y_pred, target_names=label_encoder_y.classes_))
+    save_food_model(model, label_encoder_y, label_encoders, feature_cols)
+    hashes = row_hashes(df)
+    save_training_state(hashes, hashes[X_test.index.to_numpy()], time.perf_counter() - started, full=True)
+    print(f"\n💾 Food model saved to models/food_analysis_model.pkl and models/food_analysis_model.ubj")
     print(f"💾 Food target encoder saved to models/food_label_encoder_y.pkl")
     print(f"💾 Food feature encoders saved to models/food_feature_encoders.pkl")
     print(f"💾 Food feature names saved to models/food_feature_names.pkl")
+    return model
+
+def encoder_incompatibilities(df, label_encoders, label_encoder_y, target_col="Disease_Risk"):
+    """Values in df the stored encoders cannot encode without renumbering existing codes"""
+    problems = []
+    for col, le in [*label_encoders.items(), (target_col, label_encoder_y)]:
+        known = set(map(str, le.classes_))
+        unseen = sorted(set(df[col].astype(str)) - known)
+        if unseen:
+            problems.append(f"{col}: {', '.join(unseen[:5])}{' ...' if len(unseen) > 5 else ''}")
+    return problems
+
+def train_food_model_incremental(rounds=20, params=None, compare=False):
+    """Keep boosting the saved food model on the catalog rows it has not seen yet.
+
+    New trees are fitted to the new or changed rows only, starting from the
+    saved booster's predictions. Falls back to a full retrain when there is no
+    training record or the rows bring categories the stored encoders lack.
+    With compare, also times a full retrain (not saved) and scores both
+    models on the same held-out rows.
+    """
+    print("🍎 Updating food label model with new rows...")
+    started = time.perf_counter()
+    state, trained, held_out = load_training_state()
+    if state is None or not os.path.exists("models/food_analysis_model.pkl"):
+        print("⚠️  No training record for the saved model; running a full retrain")
+        return train_food_model(params)
+
+    df = read_table(FOOD_DATA_PATH)
+    hashes = row_hashes(df)
+    new_rows = ~np.isin(hashes, trained)
+    if not new_rows.any():
+        print("✅ No new or changed rows since the last run; model left as is")
+        return None
+
+    label_encoder_y = pickle.load(open("models/food_label_encoder_y.pkl", "rb"))
+    label_encoders = pickle.load(open("models/food_feature_encoders.pkl", "rb"))
+    feature_cols = pickle.load(open("models/food_feature_names.pkl", "rb"))
+    problems = encoder_incompatibilities(df[new_rows], label_encoders, label_encoder_y)
+    if problems:
+        print("⚠️  New categories are not in the stored encoders:")
+        for problem in problems:
+            print(f"   {problem}")
+        print("↩️  Falling back to a full retrain")
+        return train_food_model(params)
+
+    X = df[feature_cols].copy()
+    for col, le in label_encoders.items():
+        X[col] = le.transform(X[col].astype(str))
+    y = label_encoder_y.transform(df["Disease_Risk"].astype(str))
+    X_new, y_new = X[new_rows], y[new_rows]
+
+    previous = pickle.load(open("models/food_analysis_model.pkl", "rb"))
+    booster = xgb.train(
+        booster_params(params, len(label_encoder_y.classes_)),
+        xgb.DMatrix(X_new, y_new, feature_names=feature_cols),
+        num_boost_round=rounds,
+        xgb_model=previous.get_booster()
+    )
+    model = XGBClassifier()
+    model.load_model(bytearray(booster.save_raw("json")))
+    save_food_model(model, label_encoder_y, label_encoders, feature_cols)
+    seconds = time.perf_counter() - started
+    save_training_state(hashes, held_out, seconds, full=False)
+    print(f"\n✅ Added {rounds} rounds fitted to {int(new_rows.sum())} new or changed rows "
+          f"({booster.num_boosted_rounds()} rounds in total) in {seconds:.2f}s")
+
+    estimate = state["full_train_seconds"] * len(df) / max(state["full_train_rows"], 1)
+    print(f"⏱️  Estimated full retrain: {estimate:.2f}s (from the last one); "
+          f"saved ~{estimate - seconds:.2f}s ({estimate / max(seconds, 1e-9):.1f}x faster)")
+
+    if compare:
+        # Both models are scored on the last full retrain's held-out rows, which neither has seen
+        test_rows = np.isin(hashes, held_out) & ~new_rows
+        train_idx, test_idx = np.flatnonzero(~test_rows), np.flatnonzero(test_rows)
+        full_started = time.perf_counter()
+        full = XGBClassifier(**{**BASE_PARAMS, **(params or {})})
+        full.fit(X.iloc[train_idx], y[train_idx])
+        full_seconds = time.perf_counter() - full_started
+        print(f"\n📊 Full retrain fit: {full_seconds:.2f}s")
+        for label, candidate in (("incremental", model), ("full retrain", full)):
+            accuracy = accuracy_score(y[test_idx], candidate.predict(X.iloc[test_idx]))
+            print(f"   {label:<13} accuracy {accuracy:.3f} on {len(test_idx)} held-out rows")
+    print("💾 Food model saved to models/food_analysis_model.pkl and models/food_analysis_model.ubj")
+    return model
 
 if __name__ == "__main__":
     print("Select model to train:")
     print("1. User nutrition model")
     print("2. Food label model")
-    choice = input("Enter 1 or 2: ").strip()
+    print("3. Food label model, incremental update with new rows")
+    choice = input("Enter 1, 2 or 3: ").strip()
     if choice == "1":
         train_user_model()
     elif choice == "2":
         train_food_model()
+    elif choice == "3":
+        train_food_model_incremental()
     else:
         print("Invalid choice.")
\ No newline at end of file
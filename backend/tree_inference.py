@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
+
+COMPILED_EXTENSION = ".trees.npz"
+FORMAT_VERSION = 1
+SUPPORTED_OBJECTIVES = ("multi:softprob", "binary:logistic")
+
+class TreeEnsemble:
+    """An XGBoost tree ensemble flattened into contiguous NumPy node arrays.
+
+    Every tree's nodes live in shared feature/threshold/left/right/
+    default_left/value arrays, with leaves pointing back at themselves, so
+    one row (or a small batch) is scored by stepping all trees down `depth`
+    levels at once. Needs only NumPy at prediction time: no pandas, no
+    sklearn wrapper and no xgboost import.
+    """
+
+    def __init__(self, feature, threshold, left, right, default_left, value, roots, tree_class,
+                 base_margin, objective, feature_names=None, source_hash=""):
+        # Index arrays are kept as intp so take() needs no conversion per call
+        self.feature = feature.astype(np.intp)
+        self.threshold = threshold
+        self.left = left.astype(np.intp)
+        self.right = right.astype(np.intp)
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots.astype(np.intp)
+        self.tree_class = tree_class
+        self.base_margin = base_margin
+        self.objective = objective
+        self.feature_names = list(feature_names or [])
+        self.source_hash = source_hash
+        self.num_class = len(base_margin)
+        self.depth = self._max_depth()
+        # children[2 * node] is the left child, children[2 * node + 1] the right one
+        self.children = np.column_stack([self.left, self.right]).ravel()
+        # (trees, classes) one-hot matrix: margins = leaf values @ class_matrix
+        self.class_matrix = np.zeros((len(roots), self.num_class))
+        self.class_matrix[np.arange(len(roots)), tree_class] = 1.0
+
+    @classmethod
+    def from_booster(cls, booster, feature_names=None, source_hash=""):
+        """Flatten a trained xgboost.Booster (honouring best_iteration)"""
+        model = json.loads(booster.save_raw("json"))
+        learner = model["learner"]
+        objective = learner["objective"]["name"]
+        if objective not in SUPPORTED_OBJECTIVES:
+            raise ValueError(f"Unsupported objective for compiled inference: {objective}")
+        gbtree = learner["gradient_booster"]
+        if gbtree.get("name", "gbtree") != "gbtree":
+            raise ValueError(f"Unsupported booster: {gbtree.get('name')}")
+        trees = gbtree["model"]["trees"]
+        tree_info = gbtree["model"]["tree_info"]
+        best_iteration = booster.attr("best_iteration")
+        if best_iteration is not None:
+            indptr = gbtree["model"]["iteration_indptr"]
+            trees = trees[:indptr[int(best_iteration) + 1]]
+
+        num_class = max(int(learner["learner_model_param"].get("num_class", 0)), 1)
+        base_score = np.atleast_1d(np.array(
+            json.loads(learner["learner_model_param"]["base_score"].replace("E", "e")), dtype=np.float64
+        ))
+        base_margin = np.broadcast_to(base_score, (num_class,)).astype(np.float64)
+        if objective == "binary:logistic":
+            base_margin = np.log(base_margin / (1 - base_margin))
+
+        offsets = np.cumsum([0] + [len(tree["left_children"]) for tree in trees])
+        columns = {name: [] for name in ("feature", "threshold", "left", "right", "default_left", "value")}
+        for tree, offset in zip(trees, offsets):
+            if any(tree["split_type"]):
+                raise ValueError("Categorical splits are not supported by compiled inference")
+            left = np.asarray(tree["left_children"], dtype=np.int64)
+            right = np.asarray(tree["right_children"], dtype=np.int64)
+            is_leaf = left == -1
+            own = np.arange(len(left)) + offset
+            columns["feature"].append(np.where(is_leaf, 0, tree["split_indices"]))
+            # Leaves keep their value in split_conditions and loop back to themselves
+            columns["threshold"].append(np.where(is_leaf, np.inf, tree["split_conditions"]))
+            columns["left"].append(np.where(is_leaf, own, left + offset))
+            columns["right"].append(np.where(is_leaf, own, right + offset))
+            columns["default_left"].append(np.asarray(tree["default_left"], dtype=bool) | is_leaf)
+            columns["value"].append(np.where(is_leaf, tree["split_conditions"], 0.0))
+
+        return cls(
+            feature=np.concatenate(columns["feature"]).astype(np.int32),
+            threshold=np.concatenate(columns["threshold"]).astype(np.float32),
+            left=np.concatenate(columns["left"]).astype(np.int32),
+            right=np.concatenate(columns["right"]).astype(np.int32),
+            default_left=np.concatenate(columns["default_left"]),
+            value=np.concatenate(columns["value"]).astype(np.float64),
+            roots=offsets[:-1].astype(np.int32),
+            tree_class=np.asarray(tree_info[:len(trees)], dtype=np.int32) if num_class > 1 else np.zeros(len(trees), dtype=np.int32),
+            base_margin=base_margin,
+            objective=objective,
+            feature_names=feature_names if feature_names is not None else booster.feature_names,
+            source_hash=source_hash
+        )
+
+    def _max_depth(self):
+        depth = 0
+        node = self.roots.copy()
+        while True:
+            nxt = np.concatenate([self.left[node], self.right[node]])
+            nxt = np.unique(nxt[self.left[nxt] != nxt]) if len(nxt) else nxt
+            depth += 1
+            if not len(nxt):
+                return depth
+            node = nxt
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            feature=self.feature.astype(np.int32), threshold=self.threshold,
+            left=self.left.astype(np.int32), right=self.right.astype(np.int32),
+            default_left=self.default_left, value=self.value, roots=self.roots.astype(np.int32),
+            tree_class=self.tree_class, base_margin=self.base_margin,
+            meta=np.array(json.dumps({
+                "version": FORMAT_VERSION,
+                "objective": self.objective,
+                "feature_names": self.feature_names,
+                "source_hash": self.source_hash
+            }))
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != FORMAT_VERSION:
+                raise ValueError(f"Unsupported compiled model version: {meta.get('version')}")
+            arrays = {key: data[key] for key in data.files if key != "meta"}
+        return cls(**arrays, objective=meta["objective"], feature_names=meta["feature_names"],
+                   source_hash=meta["source_hash"])
+
+    def leaves(self, X):
+        """Leaf node reached in every tree, shape (rows, trees)"""
+        rows, width = X.shape
+        flat = X.ravel()
+        has_missing = np.isnan(flat).any()
+        if rows == 1:
+            # Single-row fast path: plain 1-D takes, no row offsets
+            node, offsets = self.roots, 0
+        else:
+            node = np.broadcast_to(self.roots, (rows, len(self.roots)))
+            offsets = (np.arange(rows) * width)[:, None]
+        for _ in range(self.depth):
+            x = flat.take(offsets + self.feature.take(node))
+            go_right = x >= self.threshold.take(node)
+            if has_missing:
+                go_right = np.where(np.isnan(x), ~self.default_left.take(node), go_right)
+            node = self.children.take(2 * node + go_right)
+        return node.reshape(rows, -1)
+
+    def predict_margin(self, X):
+        X = self._as_matrix(X)
+        return self.value[self.leaves(X)] @ self.class_matrix + self.base_margin
+
+    def predict_proba(self, X):
+        margin = self.predict_margin(X)
+        if self.objective == "binary:logistic":
+            positive = 1.0 / (1.0 + np.exp(-margin[:, 0]))
+            return np.column_stack([1 - positive, positive])
+        margin = margin - margin.max(axis=1, keepdims=True)
+        exp = np.exp(margin)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def _as_matrix(self, X):
+        if hasattr(X, "columns") and self.feature_names:
+            X = X[self.feature_names]
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        return X[None, :] if X.ndim == 1 else X
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def compiled_path(base):
+    return f"{base}{COMPILED_EXTENSION}"
+
+def load_compiled(base, source_path):
+    """The compiled ensemble for a model file, or None if missing or built from another file"""
+    path = compiled_path(base)
+    if not os.path.exists(path) or not os.path.exists(source_path):
+        return None
+    try:
+        ensemble = TreeEnsemble.load(path)
+    except Exception as e:
+        print(f"⚠️  Ignoring unreadable compiled model {path}: {e}")
+        return None
+    return ensemble if ensemble.source_hash == file_hash(source_path) else None
+
+def compile_model(booster, base, source_path, feature_names=None, check_rows=None, atol=1e-5):
+    """Flatten booster, check it against XGBoost on check_rows and save it next to the model"""
+    ensemble = TreeEnsemble.from_booster(booster, feature_names, file_hash(source_path))
+    if check_rows is None:
+        rng = np.random.default_rng(0)
+        check_rows = rng.normal(scale=100, size=(256, booster.num_features()))
+        check_rows[rng.random(check_rows.shape) < 0.05] = np.nan
+    max_diff = check_parity(booster, ensemble, check_rows, atol)
+    ensemble.save(compiled_path(base))
+    return ensemble, max_diff
+
+def check_parity(booster, ensemble, X, atol=1e-5):
+    """Largest probability difference from XGBoost; raises if it exceeds atol"""
+    X = np.asarray(X, dtype=np.float32)
+    best_iteration = booster.attr("best_iteration")
+    iteration_range = (0, int(best_iteration) + 1) if best_iteration is not None else (0, 0)
+    expected = booster.inplace_predict(X, iteration_range=iteration_range)
+    if expected.ndim == 1:
+        expected = np.column_stack([1 - expected, expected])
+    max_diff = float(np.abs(expected - ensemble.predict_proba(X)).max())
+    if max_diff > atol:
+        raise ValueError(f"Compiled model differs from XGBoost by {max_diff:.2e} (tolerance {atol:.0e})")
+    return max_diff
+
+def _latency(predict, rows, repeat):
+    timings = []
+    for i in range(repeat):
+        row = rows[i % len(rows)][None, :]
+        start = time.perf_counter()
+        predict(row)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1e6
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+def main():
+    """Compile the native food and user models, verify parity and compare single-row latency"""
+    from model_store import MODELS, native_paths, load_native
+    parser = argparse.ArgumentParser(description="Compile XGBoost models for NumPy-only inference")
+    parser.add_argument("models", nargs="*", help=f"Models to compile: {', '.join(MODELS)} (default: all)")
+    parser.add_argument("-n", "--repeat", type=int, default=2000, help="Single-row predictions to time")
+    args = parser.parse_args()
+
+    for name in args.models or list(MODELS):
+        if name not in MODELS:
+            parser.error(f"unknown model {name!r}")
+        base = MODELS[name][2]
+        model_path = native_paths(base)[0]
+        if not os.path.exists(model_path):
+            print(f"⚠️  {model_path} not found; run model_store.py first")
+            continue
+        model, _, meta = load_native(base)
+        ensemble, max_diff = compile_model(model.booster, base, model_path, meta["feature_names"])
+        print(f"💾 {name}: {len(ensemble.roots)} trees, depth {ensemble.depth} -> {compiled_path(base)} "
+              f"(max |Δp| vs XGBoost {max_diff:.1e})")
+
+        rows = np.random.default_rng(1).normal(scale=100, size=(256, len(meta["feature_names"]))).astype(np.float32)
+        for label, predict in (("xgboost", model.predict_proba), ("compiled", ensemble.predict_proba)):
+            p50, p99 = _latency(predict, rows, args.repeat)
+            print(f"   {label:<9} single row p50 {p50:7.1f}µs  p99 {p99:7.1f}µs")
+
+if __name__ == "__main__":
+    main()